@@ -1,15 +1,29 @@
 from django.contrib import admin
-from .models import Hall, MaterialsPrices, MaterialsAmount, User
+from .models import Hall, MaterialPriceHistory, MaterialsPrices, MaterialsAmount, User, ValuationJob
 
 
 class MaterialsForProject(admin.TabularInline):
     model = MaterialsAmount
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        """
+        Material choices are read once per request instead of once per inline row.
+        """
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'material':
+            if not hasattr(request, '_material_choices'):
+                request._material_choices = list(formfield.choices)
+            formfield.choices = request._material_choices
+        return formfield
+
 
 @admin.register(Hall)
 class HallAdmin(admin.ModelAdmin):
     list_display = ['project_id', 'salesman', 'calculated_value', 'update_date']
     list_filter = ['salesman', 'calculated_value', 'update_date']
+    list_select_related = ['salesman']
+    # Maintained by the valuation signals - an edited form value would be rebased away anyway.
+    readonly_fields = ['calculated_value']
     inlines = [
         MaterialsForProject
     ]
@@ -20,12 +34,37 @@ class MaterialsPricesAdmin(admin.ModelAdmin):
     list_display = ['material_id', 'material', 'update_date']
 
 
+@admin.register(MaterialPriceHistory)
+class MaterialPriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ['history_id', 'material', 'price', 'valid_from', 'valid_to']
+    list_filter = ['material']
+    list_select_related = ['material']
+
+    # Written by price changes only (see price_history.py) - as-of valuations trust the ranges.
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(MaterialsAmount)
 class MaterialsAmountAdmin(admin.ModelAdmin):
     list_display = ['amount_id', 'project', 'material', 'amount']
     list_filter = ['material', 'project']
+    list_select_related = ['project', 'material']
 
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ['username', 'email', 'is_staff', 'is_active', 'email_verified', 'date_joined']
+
+
+@admin.register(ValuationJob)
+class ValuationJobAdmin(admin.ModelAdmin):
+    list_display = ['job_id', 'kind', 'status', 'hall', 'requested_by', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    list_select_related = ['requested_by']
@@ -0,0 +1,146 @@
+"""
+Async-native variants of the hot read endpoints, mounted under /api/async/ for ASGI deployments.
+DRF views are synchronous - under ASGI each request takes a thread through sync_to_async. These are
+plain Django async views on the async ORM with the same authentication, filters and output as
+HallViewSet / MaterialsPricesViewSet (page number pagination only; no ETags or response cache).
+benchmarks/asgi.py compares them with the DRF views under WSGI and ASGI.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import reverse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import jobs, valuation
+from .filters import HallFilter
+from .jwt import JWTAuthentication
+from .models import Hall
+from .prices import price_cache
+from .readers import hall_reader, price_reader
+from .search import HallSearchFilter
+from .serializers import ValuationJobSerializer
+
+
+PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+
+class NotFound(Exception):
+    pass
+
+
+def error(detail, status):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def async_api_view(view):
+    """
+    Authenticates the bearer token (like JWTAuthentication under DRF) and passes the user to `view`.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return error(f'Method "{request.method}" not allowed.', 405)
+        try:
+            user, _ = await JWTAuthentication().aauthenticate(request)
+        except exceptions.AuthenticationFailed as exc:
+            # JWTAuthentication has no authenticate_header(), so DRF answers 403 as well.
+            return error(str(exc.detail), 403)
+        try:
+            return await view(request, user, *args, **kwargs)
+        except NotFound as exc:
+            return error(str(exc) or 'Not found.', 404)
+    return wrapper
+
+
+def page_bounds(request, page_size_param=None):
+    """
+    (page number, page size) from the query string, sized like HallSetPagination.
+    """
+    page_size = PAGE_SIZE
+    if page_size_param:
+        try:
+            page_size = min(max(int(request.GET[page_size_param]), 1), MAX_PAGE_SIZE)
+        except (KeyError, ValueError):
+            pass
+    page = request.GET.get('page', '1')
+    if page == 'last':
+        return None, page_size
+    try:
+        number = int(page)
+    except ValueError:
+        raise NotFound('Invalid page.')
+    if number < 1:
+        raise NotFound('Invalid page.')
+    return number, page_size
+
+
+def paginated(request, count, number, page_size, results):
+    url = request.build_absolute_uri()
+    pages = max(1, -(-count // page_size))
+    if number > pages:
+        raise NotFound('Invalid page.')
+    next_url = replace_query_param(url, 'page', number + 1) if number < pages else None
+    if number <= 1:
+        previous_url = None
+    elif number == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', number - 1)
+    return JsonResponse({'count': count, 'next': next_url, 'previous': previous_url, 'results': results})
+
+
+@async_api_view
+async def hall_list(request, user):
+    # Building the filtered queryset does not touch the database.
+    filterset = HallFilter(request.GET, queryset=Hall.objects.filter(salesman=user))
+    if not filterset.is_valid():
+        return JsonResponse(filterset.errors, status=400)
+    queryset = HallSearchFilter().filter_queryset(Request(request), filterset.qs, None).order_by('-project_id')
+    number, page_size = page_bounds(request, 'page_size')
+    count = await queryset.acount()
+    if number is None:
+        number = max(1, -(-count // page_size))
+    offset = (number - 1) * page_size
+    results = [
+        hall_reader.row(row)
+        async for row in hall_reader.values(queryset)[offset:offset + page_size].aiterator()
+    ]
+    return paginated(request, count, number, page_size, results)
+
+
+@async_api_view
+async def hall_detail(request, user, pk):
+    try:
+        row = await hall_reader.values(Hall.objects.filter(salesman=user)).aget(pk=pk)
+    except Hall.DoesNotExist:
+        raise NotFound('No Hall matches the given query.')
+    return JsonResponse(hall_reader.row(row))
+
+
+@async_api_view
+async def hall_calculate(request, user, pk):
+    try:
+        hall = await Hall.objects.select_related('salesman').aget(pk=pk, salesman=user)
+    except Hall.DoesNotExist:
+        raise NotFound('No Hall matches the given query.')
+    if settings.VALUATION_JOBS['ENABLED']:
+        job = await jobs.aenqueue_calculation(hall, user)
+        response = JsonResponse(ValuationJobSerializer(job).data, status=202)
+        response['Location'] = request.build_absolute_uri(reverse('jobs-detail', args=[job.job_id]))
+        return response
+    await valuation.acalculate_stored_value(hall)
+    return JsonResponse(hall_reader.from_instance(hall))
+
+
+@async_api_view
+async def price_list(request, user):
+    rows = list((await price_cache.arows()).values())
+    number, page_size = page_bounds(request)
+    if number is None:
+        number = max(1, -(-len(rows) // page_size))
+    offset = (number - 1) * page_size
+    return paginated(request, len(rows), number, page_size, price_reader.rows(rows[offset:offset + page_size]))
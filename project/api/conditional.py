@@ -0,0 +1,93 @@
+"""
+Conditional GET for API resources.
+Lists are validated by an ETag of the newest `updated_at` and the row count of the filtered queryset,
+single objects by their own `updated_at` (ETag and Last-Modified). A matching If-None-Match /
+If-Modified-Since answers 304 before serializing. Lists send no Last-Modified - a deleted row does not
+move the newest `updated_at`, so If-Modified-Since could not tell.
+Keyset (cursor) pages are validated by their own content instead: the aggregate would read the whole
+filtered set for a page that reads a few rows, so they are built first and answer 304 without the body.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.pagination import CursorPagination
+from rest_framework.renderers import JSONRenderer
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag of the requested URL (including query string), the user and `parts`.
+    """
+    user = getattr(request.user, 'pk', None)
+    key = ':'.join(str(part) for part in (request.get_full_path(), user) + parts)
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+class ConditionalGetMixin:
+    """
+    ETag handling for list() and retrieve() of model viewsets, Last-Modified for retrieve() only.
+    Views listing something other than the model rows override list_validators().
+    """
+    def list_validators(self, request):
+        """
+        Returns the ETag of the current list page.
+        """
+        state = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            last_modified=Max('updated_at'),
+            count=Count('pk'),
+        )
+        return make_etag(request, state['last_modified'], state['count'])
+
+    def conditional_response(self, request, etag, last_modified):
+        """
+        304 (or 412) response when the client's copy is current, None otherwise.
+        """
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is not None:
+            self.add_validators(response, etag, last_modified)
+        return response
+
+    @staticmethod
+    def add_validators(response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if isinstance(self.paginator, CursorPagination):
+            return self.keyset_list(request, *args, **kwargs)
+        etag = self.list_validators(request)
+        response = self.conditional_response(request, etag, None)
+        if response is not None:
+            return response
+        # Part of the response cache key (see response_cache.CachedListMixin).
+        self.list_etag = etag
+        response = super().list(request, *args, **kwargs)
+        return self.add_validators(response, etag, None)
+
+    def keyset_list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        etag = make_etag(request, hashlib.md5(JSONRenderer().render(response.data)).hexdigest())
+        return self.conditional_response(request, etag, None) or self.add_validators(response, etag, None)
+
+    def get_object(self):
+        # retrieve() reads the object for its validators and again in super().retrieve().
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = make_etag(request, instance.updated_at)
+        response = self.conditional_response(request, etag, instance.updated_at)
+        if response is not None:
+            return response
+        response = super().retrieve(request, *args, **kwargs)
+        return self.add_validators(response, etag, instance.updated_at)
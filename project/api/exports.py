@@ -0,0 +1,82 @@
+"""
+Streaming export of halls with their bills of materials.
+Halls and material lines are read by two `.iterator()` queries ordered by project and merged on the
+fly, so memory does not grow with the number of halls - on PostgreSQL both run as server side cursors.
+"""
+import csv
+import json
+
+from django.conf import settings
+
+from .models import MaterialsAmount
+from .readers import hall_reader
+
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+FORMATS = {
+    CSV: 'text/csv',
+    NDJSON: 'application/x-ndjson',
+}
+LINE_FIELDS = ['material', 'material_name', 'amount']
+
+
+class Echo:
+    """
+    File-like object handing every csv.writer row straight back.
+    """
+    def write(self, value):
+        return value
+
+
+def halls_with_lines(halls, chunk_size=None):
+    """
+    Yields (hall dict, [line dicts]) for every hall of the `halls` queryset in project order.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    halls = halls.order_by('project_id')
+    lines = MaterialsAmount.objects.filter(
+        project__in=halls.order_by().values('project_id'),
+    ).order_by('project_id', 'amount_id').values(
+        'project_id', 'material_id', 'material__material', 'amount',
+    ).iterator(chunk_size=chunk_size)
+    line = next(lines, None)
+    for row in hall_reader.values(halls).iterator(chunk_size=chunk_size):
+        hall = hall_reader.row(row)
+        hall_lines = []
+        # The queries run at different times - skip lines of halls deleted or filtered out in between.
+        while line is not None and line['project_id'] < hall['project_id']:
+            line = next(lines, None)
+        while line is not None and line['project_id'] == hall['project_id']:
+            hall_lines.append({
+                'material': line['material_id'],
+                'material_name': line['material__material'],
+                'amount': line['amount'],
+            })
+            line = next(lines, None)
+        yield hall, hall_lines
+
+
+def csv_rows(halls):
+    """
+    One row per material line - halls without lines get one row with empty line columns.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(list(hall_reader.columns) + LINE_FIELDS)
+    for hall, lines in halls_with_lines(halls):
+        values = list(hall.values())
+        for line in lines or [dict.fromkeys(LINE_FIELDS)]:
+            yield writer.writerow(values + [line[field] for field in LINE_FIELDS])
+
+
+def ndjson_rows(halls):
+    """
+    One JSON object per hall with its lines under `materials`.
+    """
+    for hall, lines in halls_with_lines(halls):
+        hall['materials'] = lines
+        yield json.dumps(hall) + '\n'
+
+
+def rows(halls, export_format):
+    return csv_rows(halls) if export_format == CSV else ndjson_rows(halls)
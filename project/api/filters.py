@@ -0,0 +1,21 @@
+import django_filters
+
+from .models import Hall
+
+
+class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
+    pass
+
+
+class HallFilter(django_filters.FilterSet):
+    """
+    Numeric ranges, e.g. `?calculated_value_min=1000&calculated_value_max=5000&roof_slope_max=10`,
+    and `?project_id=1,2,3` for a set of halls.
+    """
+    project_id = NumberInFilter(field_name='project_id')
+    calculated_value = django_filters.RangeFilter()
+    roof_slope = django_filters.RangeFilter()
+
+    class Meta:
+        model = Hall
+        fields = ['project_id', 'calculated_value', 'roof_slope']
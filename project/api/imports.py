@@ -0,0 +1,154 @@
+"""
+Bulk import of supplier price lists.
+A CSV file with `material,price` columns is read row by row and upserted by material name in chunks
+with one INSERT ... ON CONFLICT per chunk. bulk_create() sends no signals, so halls using a changed
+price are recalculated once after the import commits instead of once per row - by a queued job
+with VALUATION_JOBS['ENABLED']. The price table stamp is replaced in the import transaction itself, so
+every process - the web workers as much as `manage.py import_prices` - reloads the prices with the commit.
+"""
+import csv
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import jobs, price_history, response_cache, valuation
+from .models import MaterialsPrices
+from .prices import price_cache
+
+
+MATERIAL_LENGTH = MaterialsPrices._meta.get_field('material').max_length
+PRICE_FIELD = MaterialsPrices._meta.get_field('price')
+MAX_PRICE = Decimal(10) ** (PRICE_FIELD.max_digits - PRICE_FIELD.decimal_places)
+PRICE_EXPONENT = Decimal(1).scaleb(-PRICE_FIELD.decimal_places)
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    rejected: int = 0
+    errors: list = field(default_factory=list)
+    changed_materials: set = field(default_factory=set)
+    job: object = None
+
+    def as_dict(self):
+        return {
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'job': self.job.job_id if self.job else None,
+        }
+
+
+def parse_row(row):
+    """
+    (material, price) of one CSV row - raises ValueError with the reason.
+    """
+    material = (row.get('material') or '').strip()
+    if not material:
+        raise ValueError('Missing material.')
+    if len(material) > MATERIAL_LENGTH:
+        raise ValueError(f'Material longer than {MATERIAL_LENGTH} characters.')
+    try:
+        price = Decimal((row.get('price') or '').strip())
+    except InvalidOperation:
+        raise ValueError('Invalid price.')
+    if not price.is_finite() or price < 0 or price.quantize(PRICE_EXPONENT) != price or price >= MAX_PRICE:
+        raise ValueError(f'Price must be at least 0, below {MAX_PRICE} and have at most 2 decimals.')
+    return material, price
+
+
+def import_prices(lines, chunk_size=None, max_errors=100, user=None):
+    """
+    Upserts prices from an iterable of CSV text lines (header `material,price`).
+    Invalid rows and repeated materials are rejected - the first `max_errors` are reported with their line number.
+    Everything is written in one transaction; affected halls are recalculated (or a job for `user` is queued)
+    and caches invalidated on commit.
+    """
+    chunk_size = chunk_size or settings.PRICE_IMPORT_CHUNK_SIZE
+    result = ImportResult()
+    reader = csv.DictReader(lines)
+    if not reader.fieldnames or not {'material', 'price'} <= {name.strip() for name in reader.fieldnames}:
+        raise ValueError('CSV header must contain material and price columns.')
+    reader.fieldnames = [name.strip() for name in reader.fieldnames]
+
+    def reject(message):
+        result.rejected += 1
+        if len(result.errors) < max_errors:
+            result.errors.append({'line': reader.line_num, 'error': message})
+
+    seen = set()
+    with transaction.atomic():
+        chunk = {}
+        for row in reader:
+            try:
+                material, price = parse_row(row)
+            except ValueError as exc:
+                reject(str(exc))
+                continue
+            if material in seen:
+                reject('Material repeated in the file.')
+                continue
+            seen.add(material)
+            chunk[material] = price
+            if len(chunk) >= chunk_size:
+                _upsert(chunk, result)
+                chunk = {}
+        if chunk:
+            _upsert(chunk, result)
+        if result.inserted or result.updated:
+            price_cache.invalidate()
+            transaction.on_commit(lambda: _after_import(result, user))
+    return result
+
+
+def _upsert(chunk, result):
+    existing = {
+        row['material']: row
+        for row in MaterialsPrices.objects.filter(material__in=chunk).values('material_id', 'material', 'price')
+    }
+    now = timezone.now()
+    rows = []
+    for material, price in chunk.items():
+        current = existing.get(material)
+        if current is None:
+            result.inserted += 1
+        elif current['price'] != price:
+            result.updated += 1
+            result.changed_materials.add(current['material_id'])
+        else:
+            result.unchanged += 1
+            continue
+        rows.append(MaterialsPrices(material=material, price=price, update_date=now.date(), updated_at=now))
+    MaterialsPrices.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['material'],
+        update_fields=['price', 'update_date', 'updated_at'],
+    )
+    # bulk_create() sets no primary keys on conflicts with every backend - look them up by name.
+    material_ids = MaterialsPrices.objects.filter(material__in=[row.material for row in rows]).values_list(
+        'material', 'material_id',
+    )
+    price_history.record({material_id: chunk[material] for material, material_id in material_ids}, now)
+
+
+def _after_import(result, user=None):
+    if not result.changed_materials:
+        response_cache.invalidate(response_cache.PRICES)
+    elif settings.VALUATION_JOBS['ENABLED']:
+        # The job invalidates the hall lists once the values are written.
+        result.job = jobs.enqueue_recalculation(materials=sorted(result.changed_materials), user=user)
+        response_cache.invalidate(response_cache.PRICES)
+    else:
+        valuation.recalculate_halls(
+            materials=sorted(result.changed_materials),
+            batch_size=settings.HALL_RECALCULATE_BATCH_SIZE,
+        )
+        response_cache.invalidate(response_cache.PRICES, response_cache.HALLS)
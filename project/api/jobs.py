@@ -0,0 +1,138 @@
+"""
+Database backed queue of valuation jobs.
+With VALUATION_JOBS['ENABLED'] the calculate and recalculate endpoints only enqueue a ValuationJob and
+answer 202 - `manage.py valuation_worker` runs them. Workers claim jobs with SELECT ... FOR UPDATE
+SKIP LOCKED, so any number of them (threads or processes) can share the table without taking the
+same job twice. A job left running longer than VALUATION_JOBS['TIMEOUT'] seconds (worker killed) is
+claimed again, up to MAX_ATTEMPTS times.
+A worker process shares nothing with the web processes but the database: it reloads prices by the
+stamp in PriceTableVersion (see prices.py), and the values it writes move the list ETags that key the
+web processes' response caches - its own generation changes are a bonus with a shared cache.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import response_cache, valuation
+from .models import Hall, ValuationJob
+
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_calculation(hall, user=None):
+    """
+    Queued job calculating `hall` - an already queued one is reused.
+    """
+    job = ValuationJob.objects.filter(kind=ValuationJob.CALCULATE, hall=hall, status=ValuationJob.QUEUED).first()
+    if job is None:
+        job = ValuationJob.objects.create(kind=ValuationJob.CALCULATE, hall=hall, requested_by=user)
+    return job
+
+
+async def aenqueue_calculation(hall, user=None):
+    """
+    enqueue_calculation() on the async ORM.
+    """
+    job = await ValuationJob.objects.filter(kind=ValuationJob.CALCULATE, hall=hall, status=ValuationJob.QUEUED).afirst()
+    if job is None:
+        job = await ValuationJob.objects.acreate(kind=ValuationJob.CALCULATE, hall=hall, requested_by=user)
+    return job
+
+
+def enqueue_recalculation(materials=None, batch_size=None, user=None):
+    return ValuationJob.objects.create(
+        kind=ValuationJob.RECALCULATE,
+        materials=materials,
+        batch_size=batch_size,
+        requested_by=user,
+    )
+
+
+def claim():
+    """
+    Marks the oldest open job as running and returns it, None when there is nothing to do.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.VALUATION_JOBS['TIMEOUT'])
+    with transaction.atomic():
+        job = ValuationJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=ValuationJob.QUEUED) | Q(status=ValuationJob.RUNNING, started_at__lt=stale),
+        ).order_by('job_id').first()
+        if job is None:
+            return None
+        if job.attempts >= settings.VALUATION_JOBS['MAX_ATTEMPTS']:
+            job.status = ValuationJob.FAILED
+            job.error = job.error or 'Worker did not finish the job.'
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'error', 'finished_at'])
+            return claim()
+        job.status = ValuationJob.RUNNING
+        job.attempts += 1
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'attempts', 'started_at'])
+    return job
+
+
+def run(job):
+    """
+    Executes a claimed job and records the outcome on it.
+    """
+    try:
+        if job.kind == ValuationJob.CALCULATE:
+            hall = Hall.objects.get(pk=job.hall_id)
+            valuation.calculate_stored_value(hall)
+            job.calculated_value = hall.calculated_value
+        else:
+            job.updated = valuation.recalculate_halls(
+                materials=job.materials,
+                batch_size=job.batch_size or settings.HALL_RECALCULATE_BATCH_SIZE,
+            )
+            response_cache.invalidate(response_cache.HALLS)
+        job.status = ValuationJob.DONE
+        job.error = ''
+    except Exception as exc:
+        logger.exception('Valuation job %s failed', job.job_id)
+        job.status = ValuationJob.FAILED
+        job.error = f'{type(exc).__name__}: {exc}'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'calculated_value', 'updated', 'error', 'finished_at'])
+    return job
+
+
+def work(stop=None, poll_interval=None, once=False):
+    """
+    Runs jobs until `stop` (a threading.Event) is set - or, with `once`, until the queue is empty.
+    Returns the number of jobs run.
+    """
+    stop = stop or threading.Event()
+    poll_interval = settings.VALUATION_JOBS['POLL_INTERVAL'] if poll_interval is None else poll_interval
+    done = 0
+    try:
+        while not stop.is_set():
+            if not connection.in_atomic_block:
+                # Like between requests - drop connections past CONN_MAX_AGE or broken ones.
+                close_old_connections()
+            try:
+                job = claim()
+                if job is not None:
+                    run(job)
+            except DatabaseError:
+                # Lost connection or lock timeout - an unfinished job is taken over after TIMEOUT.
+                logger.exception('Valuation worker database error')
+                stop.wait(poll_interval)
+                continue
+            if job is None:
+                if once:
+                    break
+                stop.wait(poll_interval)
+                continue
+            done += 1
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+    return done
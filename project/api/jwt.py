@@ -3,13 +3,85 @@ from rest_framework import exceptions
 
 from django.conf import settings
 
+import copy
+import threading
+import time
+from collections import OrderedDict
+
 import jwt
 
+from . import tokens
 from .models import User
 
 
+STATELESS_CLAIMS = ['user_id', 'username', 'email', 'is_staff', 'is_superuser', 'is_active', 'ver']
+
+
+class UserCache:
+    """
+    Bounded LRU cache of users with a time to live, local to the process.
+    Entries are keyed by user id and only returned for the token version they were stored with.
+    """
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic() or user.token_version != version:
+                del self._users[user_id]
+                return None
+            self._users.move_to_end(user_id)
+        return copy.copy(user)
+
+    def set(self, user):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._users[user.pk] = (copy.copy(user), time.monotonic() + self.ttl)
+            self._users.move_to_end(user.pk)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache(settings.JWT_AUTH['USER_CACHE_SIZE'], settings.JWT_AUTH['USER_CACHE_TTL'])
+
+
 class JWTAuthentication(BaseAuthentication):
+    """
+    Bearer token authentication.
+    The way the user is looked up comes from JWT_AUTH['MODE'] unless the class sets `mode` itself.
+    Users built in 'stateless' mode carry no password and must never be saved.
+    """
+    mode = None
+
     def authenticate(self, request):
+        token, payload = self.get_payload(request)
+        return self.get_user(payload), token
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views - the user row is read with the async ORM.
+        """
+        token, payload = self.get_payload(request)
+        return await self.aget_user(payload), token
+
+    @staticmethod
+    def get_payload(request):
         auth_header = get_authorization_header(request)
         auth_data = auth_header.decode('utf-8')
         auth_token = auth_data.split(' ')
@@ -19,13 +91,82 @@ class JWTAuthentication(BaseAuthentication):
         token = auth_token[1]
 
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms='HS256')
-            email = payload['email']
-            user = User.objects.get(email=email)
-            return user, token
+            payload = tokens.decode(token)
         except jwt.ExpiredSignatureError:
             raise exceptions.AuthenticationFailed('Please login again.')
         except jwt.DecodeError:
             raise exceptions.AuthenticationFailed('Token not valid.')
-        except User.DoesNotExist:
+        return token, payload
+
+    def get_user(self, payload):
+        mode = self.mode or settings.JWT_AUTH['MODE']
+        if mode == 'stateless' and all(claim in payload for claim in STATELESS_CLAIMS):
+            return self.get_user_from_claims(payload)
+        if mode in ['cached', 'stateless'] and 'user_id' in payload:
+            user = user_cache.get(payload['user_id'], payload.get('ver'))
+            if user is None:
+                user = self.get_user_from_db(payload)
+                user_cache.set(user)
+            return user
+        return self.get_user_from_db(payload)
+
+    async def aget_user(self, payload):
+        mode = self.mode or settings.JWT_AUTH['MODE']
+        if mode == 'stateless' and all(claim in payload for claim in STATELESS_CLAIMS):
+            return self.get_user_from_claims(payload)
+        if mode in ['cached', 'stateless'] and 'user_id' in payload:
+            user = user_cache.get(payload['user_id'], payload.get('ver'))
+            if user is None:
+                user = await self.aget_user_from_db(payload)
+                user_cache.set(user)
+            return user
+        return await self.aget_user_from_db(payload)
+
+    @staticmethod
+    def get_user_from_db(payload):
+        try:
+            if 'user_id' in payload:
+                user = User.objects.get(pk=payload['user_id'])
+            else:
+                user = User.objects.get(email=payload['email'])
+        except (User.DoesNotExist, KeyError):
             raise exceptions.AuthenticationFailed('User does not exist.')
+        return JWTAuthentication.check_version(payload, user)
+
+    @staticmethod
+    async def aget_user_from_db(payload):
+        try:
+            if 'user_id' in payload:
+                user = await User.objects.aget(pk=payload['user_id'])
+            else:
+                user = await User.objects.aget(email=payload['email'])
+        except (User.DoesNotExist, KeyError):
+            raise exceptions.AuthenticationFailed('User does not exist.')
+        return JWTAuthentication.check_version(payload, user)
+
+    @staticmethod
+    def check_version(payload, user):
+        if 'ver' in payload and payload['ver'] != user.token_version:
+            raise exceptions.AuthenticationFailed('Token not valid.')
+        return user
+
+    @staticmethod
+    def get_user_from_claims(payload):
+        user = User(
+            id=payload['user_id'],
+            username=payload['username'],
+            email=payload['email'],
+            is_staff=payload['is_staff'],
+            is_superuser=payload['is_superuser'],
+            is_active=payload['is_active'],
+            token_version=payload['ver'],
+        )
+        user._state.adding = False
+        return user
+
+
+class DatabaseJWTAuthentication(JWTAuthentication):
+    """
+    Always reads the user row - for views that check the password or save the user.
+    """
+    mode = 'database'
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api import imports
+
+
+class Command(BaseCommand):
+    help = 'Upserts material prices by name from a CSV file with material and price columns.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import.')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.PRICE_IMPORT_CHUNK_SIZE,
+            help='Number of prices written per INSERT ... ON CONFLICT.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as csv_file:
+                result = imports.import_prices(csv_file, chunk_size=options['chunk_size'])
+        except (OSError, ValueError, UnicodeDecodeError) as exc:
+            raise CommandError(exc)
+        for error in result.errors:
+            self.stderr.write(f"Line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted {result.inserted}, updated {result.updated}, unchanged {result.unchanged}, '
+            f'rejected {result.rejected} prices.'
+        ))
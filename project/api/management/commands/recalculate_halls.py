@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import response_cache, valuation
+
+
+class Command(BaseCommand):
+    help = 'Recalculates calculated_value of all halls, e.g. after a price change.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--material',
+            action='append',
+            type=int,
+            dest='materials',
+            help='Only recalculate halls using this material id. Can be repeated.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.HALL_RECALCULATE_BATCH_SIZE,
+            help='Number of halls written per bulk_update.',
+        )
+
+    def handle(self, *args, **options):
+        updated = valuation.recalculate_halls(materials=options['materials'], batch_size=options['batch_size'])
+        response_cache.invalidate(response_cache.HALLS)
+        self.stdout.write(self.style.SUCCESS(f'Recalculated {updated} halls.'))
@@ -0,0 +1,56 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs queued valuation jobs (see api/jobs.py) until interrupted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of worker threads, each with its own database connection.',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.VALUATION_JOBS['POLL_INTERVAL'],
+            help='Seconds to wait before polling an empty queue again.',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when the queue is empty instead of waiting for new jobs.',
+        )
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        counts = []
+
+        def worker():
+            counts.append(jobs.work(stop, options['poll_interval'], options['once']))
+
+        threads = [
+            threading.Thread(target=worker, name=f'valuation-worker-{number}')
+            for number in range(options['workers'])
+        ]
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping after the running jobs...')
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS(f'Ran {sum(counts)} jobs.'))
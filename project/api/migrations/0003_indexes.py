@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """
+    Folds repeated (project, material) lines into the first one so the unique constraint can be added.
+    Hall values do not change - the amounts are summed.
+    """
+    MaterialsAmount = apps.get_model('api', 'MaterialsAmount')
+    duplicates = MaterialsAmount.objects.filter(material__isnull=False).values('project', 'material').annotate(
+        lines=models.Count('amount_id'),
+        total=models.Sum('amount'),
+        first=models.Min('amount_id'),
+    ).filter(lines__gt=1)
+    for duplicate in list(duplicates):
+        MaterialsAmount.objects.filter(pk=duplicate['first']).update(amount=duplicate['total'])
+        MaterialsAmount.objects.filter(
+            project=duplicate['project'],
+            material=duplicate['material'],
+        ).exclude(pk=duplicate['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_user_token_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hall',
+            index=models.Index(fields=['salesman', '-project_id'], name='hall_salesman_project_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hall',
+            index=models.Index(condition=models.Q(('calculated_value__isnull', True)), fields=['project_id'], name='hall_not_calculated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materialsprices',
+            index=models.Index(fields=['material', 'price'], name='materialsprices_material_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='materialsprices',
+            index=models.Index(fields=['price'], name='materialsprices_price_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='materialsamount',
+            constraint=models.UniqueConstraint(fields=('project', 'material'), name='materialsamount_project_material_uniq'),
+        ),
+        # Single column FK indexes are covered by the composite index and the unique constraint above.
+        migrations.AlterField(
+            model_name='hall',
+            name='salesman',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='materialsamount',
+            name='project',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.hall'),
+        ),
+    ]
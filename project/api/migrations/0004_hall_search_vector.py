@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:16
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    GIN index and initial vectors exist only on PostgreSQL, other databases search without them.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX hall_search_vector_idx ON api_hall USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        "UPDATE api_hall SET search_vector = to_tsvector('simple', "
+        "api_hall.project_id::text || ' ' || COALESCE(u.username, '') || ' ' || COALESCE(u.email, '')) "
+        "FROM api_hall h LEFT JOIN api_user u ON u.id = h.salesman_id "
+        "WHERE h.project_id = api_hall.project_id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS hall_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hall',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='hall',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='hall_search_vector_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+    ]
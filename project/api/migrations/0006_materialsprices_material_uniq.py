@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+def rename_duplicate_materials(apps, schema_editor):
+    """
+    Gives repeated material names a ` #<id>` suffix (the oldest row keeps the name) so the unique
+    constraint can be added. Lines keep pointing at the same rows - hall values do not change.
+    Merge or rename them properly afterwards.
+    """
+    MaterialsPrices = apps.get_model('api', 'MaterialsPrices')
+    max_length = MaterialsPrices._meta.get_field('material').max_length
+    duplicates = MaterialsPrices.objects.values('material').annotate(
+        rows=models.Count('material_id'),
+        first=models.Min('material_id'),
+    ).filter(rows__gt=1)
+    for duplicate in list(duplicates):
+        for price in MaterialsPrices.objects.filter(material=duplicate['material']).exclude(pk=duplicate['first']):
+            suffix = f' #{price.pk}'
+            price.material = price.material[:max_length - len(suffix)] + suffix
+            price.save(update_fields=['material'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_materials, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='materialsprices',
+            constraint=models.UniqueConstraint(fields=('material',), name='materialsprices_material_uniq'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_materialsprices_material_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValuationJob',
+            fields=[
+                ('job_id', models.AutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('calculate', 'Calculate hall'), ('recalculate', 'Recalculate halls')], max_length=16)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('materials', models.JSONField(blank=True, null=True)),
+                ('batch_size', models.PositiveIntegerField(blank=True, null=True)),
+                ('calculated_value', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('updated', models.PositiveIntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('hall', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.hall')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status__in', ['queued', 'running'])), fields=['job_id'], name='valuationjob_open_idx')],
+            },
+        ),
+    ]
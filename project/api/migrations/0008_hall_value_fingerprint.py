@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_valuationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hall',
+            name='value_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:22
+
+from datetime import datetime, timezone
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def record_current_prices(apps, schema_editor):
+    """
+    Opens the history with the current prices. Nothing is known about earlier prices, so these are
+    taken to have held since the epoch - as-of valuations before this migration use them.
+    """
+    MaterialsPrices = apps.get_model('api', 'MaterialsPrices')
+    MaterialPriceHistory = apps.get_model('api', 'MaterialPriceHistory')
+    since = datetime(1970, 1, 1, tzinfo=timezone.utc)
+    MaterialPriceHistory.objects.bulk_create(
+        (
+            MaterialPriceHistory(material_id=material_id, price=price, valid_from=since)
+            for material_id, price in MaterialsPrices.objects.values_list('material_id', 'price').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_hall_value_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaterialPriceHistory',
+            fields=[
+                ('history_id', models.AutoField(primary_key=True, serialize=False)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('valid_from', models.DateTimeField()),
+                ('valid_to', models.DateTimeField(blank=True, null=True)),
+                ('material', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='history', to='api.materialsprices')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['material', 'valid_from'], name='pricehistory_material_from_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('valid_to__isnull', True)), fields=('material',), name='pricehistory_one_current_uniq')],
+            },
+        ),
+        migrations.RunPython(record_current_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:09
+
+import uuid
+
+from django.db import migrations, models
+
+
+def create_stamp(apps, schema_editor):
+    apps.get_model('api', 'PriceTableVersion').objects.create(pk=1, stamp=uuid.uuid4().hex)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_materialpricehistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceTableVersion',
+            fields=[
+                ('version_id', models.AutoField(primary_key=True, serialize=False)),
+                ('stamp', models.CharField(max_length=32)),
+            ],
+        ),
+        migrations.RunPython(create_stamp, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_pricetableversion'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='hall',
+            name='hall_not_calculated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='materialsprices',
+            name='materialsprices_material_idx',
+        ),
+    ]
@@ -1,12 +1,13 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.conf import settings
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.contrib.auth.models import PermissionsMixin, AbstractBaseUser, UserManager
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 
-import jwt
-from datetime import datetime, timedelta
+from . import tokens
 
 
 class MyUserManager(UserManager):
@@ -79,6 +80,13 @@ class User(PermissionsMixin, AbstractBaseUser):
             'Designates whether this users email is verified.'
         ),
     )
+    token_version = models.PositiveIntegerField(
+        _('token version'),
+        default=0,
+        help_text=_(
+            'Bumped when password, active or staff status changes - invalidates previously issued tokens.'
+        ),
+    )
     objects = MyUserManager()
 
     EMAIL_FIELD = 'email'
@@ -87,16 +95,20 @@ class User(PermissionsMixin, AbstractBaseUser):
 
     @property
     def token(self):
-        token = jwt.encode(
-            {
-                'username': self.username,
-                'email': self.email,
-                'exp': datetime.utcnow() + timedelta(hours=24)
-            },
-            settings.SECRET_KEY,
-            algorithm='HS256'
-        )
-        return token
+        """
+        Access token, signed once per instance (i.e. once per login) and reused afterwards.
+        """
+        return self._issued_token('access_token')
+
+    @property
+    def refresh_token(self):
+        return self._issued_token('refresh_token')
+
+    def _issued_token(self, kind):
+        issued = self.__dict__.setdefault('_issued_tokens', {})
+        if (kind, self.token_version) not in issued:
+            issued[(kind, self.token_version)] = getattr(tokens, kind)(self)
+        return issued[(kind, self.token_version)]
 
 
 class MaterialsPrices(models.Model):
@@ -104,11 +116,61 @@ class MaterialsPrices(models.Model):
     material = models.CharField(max_length=32)
     price = models.DecimalField(max_digits=7, decimal_places=2)
     update_date = models.DateField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['price'], name='materialsprices_price_idx'),
+        ]
+        constraints = [
+            # Price list imports upsert by name.
+            models.UniqueConstraint(fields=['material'], name='materialsprices_material_uniq'),
+        ]
 
     def __str__(self):
         return f'{self.material_id} - {self.material}'
 
 
+class PriceTableVersion(models.Model):
+    """
+    Single row whose stamp changes with every write to MaterialsPrices - see prices.py.
+    """
+    version_id = models.AutoField(primary_key=True)
+    stamp = models.CharField(max_length=32)
+
+    def __str__(self):
+        return self.stamp
+
+
+class MaterialPriceHistory(models.Model):
+    """
+    Price of a material in force from `valid_from` until `valid_to` (open while current).
+    Written by the price signals and price imports - see price_history.py.
+    """
+    history_id = models.AutoField(primary_key=True)
+    material = models.ForeignKey(MaterialsPrices, on_delete=models.CASCADE, related_name='history', db_index=False)
+    price = models.DecimalField(max_digits=7, decimal_places=2)
+    valid_from = models.DateTimeField()
+    valid_to = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # As-of lookups: the last row of a material starting at or before the date.
+            models.Index(fields=['material', 'valid_from'], name='pricehistory_material_from_idx'),
+        ]
+        constraints = [
+            # One current price per material.
+            models.UniqueConstraint(
+                fields=['material'],
+                condition=models.Q(valid_to__isnull=True),
+                name='pricehistory_one_current_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.material_id} - {self.price} from {self.valid_from}'
+
+
 class Hall(models.Model):
     project_id = models.AutoField(primary_key=True)
     salesman = models.ForeignKey(
@@ -116,13 +178,27 @@ class Hall(models.Model):
         on_delete=models.SET_NULL,
         blank=True,
         null=True,
+        db_index=False,
     )
     length = models.DecimalField(max_digits=5, decimal_places=2)
     width = models.DecimalField(max_digits=5, decimal_places=2)
     pole_height = models.DecimalField(max_digits=4, decimal_places=2)
     roof_slope = models.SmallIntegerField()
     update_date = models.DateField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True)
     calculated_value = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    # Digest of the inputs and result of the last calculate - see valuation.calculate_stored_value().
+    value_fingerprint = models.CharField(max_length=40, blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='hall_search_vector_idx'),
+            # Per-salesman list ordered by -project_id - also serves salesman lookups.
+            models.Index(fields=['salesman', '-project_id'], name='hall_salesman_project_idx'),
+            # Max(updated_at) of a salesman's halls - list ETags.
+            models.Index(fields=['salesman', 'updated_at'], name='hall_salesman_updated_idx'),
+        ]
 
     def __str__(self):
         return f'{self.project_id}'
@@ -130,10 +206,60 @@ class Hall(models.Model):
 
 class MaterialsAmount(models.Model):
     amount_id = models.AutoField(primary_key=True)
-    project = models.ForeignKey(Hall, on_delete=models.CASCADE)
+    project = models.ForeignKey(Hall, on_delete=models.CASCADE, db_index=False)
     material = models.ForeignKey(MaterialsPrices, on_delete=models.SET_NULL, null=True)
     amount = models.SmallIntegerField()
     update_date = models.DateField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # Its index also serves project lookups.
+            models.UniqueConstraint(fields=['project', 'material'], name='materialsamount_project_material_uniq'),
+        ]
 
     def __str__(self):
         return f'{self.project} - {self.material}'
+
+
+class ValuationJob(models.Model):
+    """
+    Queued valuation work, picked up by `manage.py valuation_worker` (see jobs.py).
+    """
+    CALCULATE = 'calculate'
+    RECALCULATE = 'recalculate'
+    KINDS = [(CALCULATE, 'Calculate hall'), (RECALCULATE, 'Recalculate halls')]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    job_id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=16, choices=KINDS)
+    status = models.CharField(max_length=16, choices=STATUSES, default=QUEUED)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    hall = models.ForeignKey(Hall, on_delete=models.CASCADE, null=True, blank=True)
+    materials = models.JSONField(null=True, blank=True)
+    batch_size = models.PositiveIntegerField(null=True, blank=True)
+    calculated_value = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    updated = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the oldest open job.
+            models.Index(
+                fields=['job_id'],
+                condition=models.Q(status__in=['queued', 'running']),
+                name='valuationjob_open_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.job_id} - {self.kind} ({self.status})'
@@ -0,0 +1,53 @@
+"""
+Validity ranges of material prices.
+MaterialsPrices only holds the current price; every change also closes the open MaterialPriceHistory
+row of the material and opens a new one, so the price in force at any moment can be looked up -
+`valuation.calculate_value(hall, as_of=...)` and `valuation.annotate_value(queryset, as_of=...)` price
+lines through the history in the same query. Lookups use the (material, valid_from) index.
+"""
+from django.db.models import FilteredRelation, Q
+from django.utils import timezone
+
+from .models import MaterialPriceHistory
+
+
+def record(prices, now=None):
+    """
+    Starts a new validity range for each {material_id: price} - the open range of the material ends `now`.
+    """
+    if not prices:
+        return
+    now = now or timezone.now()
+    MaterialPriceHistory.objects.filter(material__in=list(prices), valid_to__isnull=True).update(valid_to=now)
+    MaterialPriceHistory.objects.bulk_create([
+        MaterialPriceHistory(material_id=material_id, price=price, valid_from=now)
+        for material_id, price in prices.items()
+    ])
+
+
+def in_force(as_of, prefix=''):
+    """
+    Q matching history rows valid at `as_of` - `prefix` is the path to the history relation, if any.
+    """
+    prefix = f'{prefix}__' if prefix else ''
+    return Q(**{f'{prefix}valid_from__lte': as_of}) & (
+        Q(**{f'{prefix}valid_to__gt': as_of}) | Q(**{f'{prefix}valid_to__isnull': True})
+    )
+
+
+def price_as_of(relation, as_of):
+    """
+    FilteredRelation joining the history row in force at `as_of` through `relation`,
+    e.g. 'material__history' from MaterialsAmount.
+    """
+    return FilteredRelation(relation, condition=in_force(as_of, relation))
+
+
+def prices_as_of(as_of, material_ids=None):
+    """
+    {material_id: price} in force at `as_of` - materials without a price then are left out.
+    """
+    queryset = MaterialPriceHistory.objects.filter(in_force(as_of))
+    if material_ids is not None:
+        queryset = queryset.filter(material__in=list(material_ids))
+    return dict(queryset.values_list('material_id', 'price'))
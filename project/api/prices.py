@@ -0,0 +1,86 @@
+"""
+Process-local copy of the MaterialsPrices table.
+Every save or delete of a price replaces the stamp of the single PriceTableVersion row, in the same
+transaction as the write. Readers compare it with the stamp their copy was loaded under and reload
+the table when it differs - one indexed query per read, seen by every worker and process the moment
+the write commits, whatever the cache backend.
+The stamp is random rather than a counter, so a bump rolled back with its transaction can never be
+taken for a later one.
+"""
+import threading
+import uuid
+
+from .models import MaterialsPrices, PriceTableVersion
+
+
+class PriceCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._rows = {}
+        self._prices = {}
+
+    @staticmethod
+    def stamps():
+        return PriceTableVersion.objects.values_list('stamp', flat=True)
+
+    def version(self):
+        return self.stamps().first() or ''
+
+    async def aversion(self):
+        return await self.stamps().afirst() or ''
+
+    @staticmethod
+    def table():
+        return MaterialsPrices.objects.order_by('material_id').values('material_id', 'material', 'price', 'update_date')
+
+    def refresh(self):
+        version = self.version()
+        if version == self._version:
+            return
+        self._load(version, {row['material_id']: row for row in self.table()})
+
+    async def arefresh(self):
+        version = await self.aversion()
+        if version == self._version:
+            return
+        self._load(version, {row['material_id']: row async for row in self.table()})
+
+    def _load(self, version, rows):
+        with self._lock:
+            self._rows = rows
+            self._prices = {material_id: row['price'] for material_id, row in rows.items()}
+            self._version = version
+
+    def rows(self):
+        """
+        {material_id: {'material_id', 'material', 'price', 'update_date'}} - do not modify.
+        """
+        self.refresh()
+        return self._rows
+
+    def prices(self):
+        """
+        {material_id: Decimal price} - do not modify.
+        """
+        self.refresh()
+        return self._prices
+
+    async def arows(self):
+        await self.arefresh()
+        return self._rows
+
+    async def aprices(self):
+        await self.arefresh()
+        return self._prices
+
+    def invalidate(self):
+        """
+        Call inside the transaction writing the prices - other readers see the new stamp with the rows.
+        """
+        stamp = uuid.uuid4().hex
+        if not PriceTableVersion.objects.update(stamp=stamp):
+            PriceTableVersion.objects.update_or_create(pk=1, defaults={'stamp': stamp})
+
+
+price_cache = PriceCache()
@@ -0,0 +1,124 @@
+"""
+Lean read path for the hot list endpoints.
+A ValuesReader turns `.values()` rows (or model instances) into exactly what the model serializer
+would return, without going through DRF fields for every row. The serializers stay the reference -
+tests compare both outputs - and keep handling writes.
+"""
+from decimal import Decimal
+
+from rest_framework.response import Response
+
+
+def decimal_string(decimal_places):
+    """
+    Same as DRF's DecimalField with COERCE_DECIMAL_TO_STRING.
+    """
+    exponent = Decimal(1).scaleb(-decimal_places)
+
+    def convert(value):
+        return None if value is None else f'{value.quantize(exponent):f}'
+    return convert
+
+
+def date_string(value):
+    return None if value is None else value.isoformat()
+
+
+def unchanged(value):
+    return value
+
+
+class ValuesReader:
+    """
+    `columns` maps output field -> (values() lookup, converter) in output order.
+    """
+    def __init__(self, columns):
+        self.columns = columns
+        self.lookups = list(dict.fromkeys(lookup for lookup, _ in columns.values()))
+        self._row_columns = [(name, lookup, convert) for name, (lookup, convert) in columns.items()]
+        self._instance_columns = [
+            (name, lookup.split('__'), convert) for name, (lookup, convert) in columns.items()
+        ]
+
+    def values(self, queryset):
+        return queryset.values(*self.lookups)
+
+    def row(self, values):
+        return {name: convert(values[lookup]) for name, lookup, convert in self._row_columns}
+
+    def rows(self, rows):
+        return [self.row(values) for values in rows]
+
+    def from_instance(self, instance):
+        data = {}
+        for name, path, convert in self._instance_columns:
+            value = instance
+            for attribute in path:
+                value = getattr(value, attribute)
+                if value is None:
+                    break
+            data[name] = convert(value)
+        return data
+
+
+# Mirrors HallSerializer - `salesman` is str(user), i.e. the email.
+hall_reader = ValuesReader({
+    'project_id': ('project_id', unchanged),
+    'salesman': ('salesman__email', unchanged),
+    'length': ('length', decimal_string(2)),
+    'width': ('width', decimal_string(2)),
+    'pole_height': ('pole_height', decimal_string(2)),
+    'roof_slope': ('roof_slope', unchanged),
+    'update_date': ('update_date', date_string),
+    'calculated_value': ('calculated_value', decimal_string(2)),
+})
+
+# Mirrors MaterialsAmountSerializer.
+amount_reader = ValuesReader({
+    'amount_id': ('amount_id', unchanged),
+    'project': ('project_id', unchanged),
+    'material': ('material_id', unchanged),
+    'amount': ('amount', unchanged),
+    'update_date': ('update_date', date_string),
+})
+
+# Mirrors MaterialsPricesSerializer - rows as kept by the price cache.
+price_reader = ValuesReader({
+    'material_id': ('material_id', unchanged),
+    'material': ('material', unchanged),
+    'price': ('price', decimal_string(2)),
+    'update_date': ('update_date', date_string),
+})
+
+# Fresh values of GET /api/halls/values.
+hall_value_reader = ValuesReader({
+    'project_id': ('project_id', unchanged),
+    'calculated_value': ('calculated_value', decimal_string(2)),
+})
+
+# Quoted variants of POST /api/halls/quote - dimensions as in HallSerializer plus the value.
+quote_reader = ValuesReader({
+    'length': ('length', decimal_string(2)),
+    'width': ('width', decimal_string(2)),
+    'pole_height': ('pole_height', decimal_string(2)),
+    'roof_slope': ('roof_slope', unchanged),
+    'calculated_value': ('calculated_value', decimal_string(2)),
+})
+
+
+class ValuesReadMixin:
+    """
+    list() and retrieve() through `values_reader` instead of the serializer.
+    Goes after the conditional / caching mixins - it does not call super().
+    """
+    values_reader = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.values_reader.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.values_reader.rows(page))
+        return Response(self.values_reader.rows(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(self.values_reader.from_instance(self.get_object()))
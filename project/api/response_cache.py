@@ -0,0 +1,87 @@
+"""
+Cache of serialized list responses.
+Entries are keyed by scope generations plus the full URL (filters, search, page) - the user is part of
+the scope for per-salesman lists. Signals replace the generation of every scope a write can change,
+so old entries are never read again and simply expire.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+HALLS = 'halls'
+PRICES = 'prices'
+
+
+def get_cache():
+    return caches[settings.API_RESPONSE_CACHE['ALIAS']]
+
+
+def halls_scope(salesman_id):
+    return f'{HALLS}:{salesman_id}'
+
+
+def invalidate(*scopes):
+    _replace_generations(scopes)
+    # Again after commit - a list read in between may have cached pre-commit rows under the new generation.
+    transaction.on_commit(lambda: _replace_generations(scopes))
+
+
+def _replace_generations(scopes):
+    get_cache().set_many({f'api:generation:{scope}': uuid.uuid4().hex for scope in scopes}, timeout=None)
+
+
+def invalidate_halls(salesman_ids):
+    invalidate(*[halls_scope(salesman_id) for salesman_id in set(salesman_ids) if salesman_id is not None])
+
+
+async def ainvalidate_halls(salesman_ids):
+    await get_cache().aset_many(
+        {f'api:generation:{halls_scope(salesman_id)}': uuid.uuid4().hex
+         for salesman_id in set(salesman_ids) if salesman_id is not None},
+        timeout=None,
+    )
+
+
+def generations(scopes):
+    cache = get_cache()
+    keys = [f'api:generation:{scope}' for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+class CachedListMixin:
+    """
+    Serves list() from the response cache. Views name the scopes their list depends on.
+    Behind ConditionalGetMixin the key also holds the list ETag it read from the database, so a write the
+    generations missed - another process with a local memory cache, a bulk update without signals - still
+    leads to a fresh body under the fresh ETag. Keyset pages have no ETag before they are read and are
+    cheap to read, so they are not cached.
+    """
+    def list_cache_scopes(self, request):
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        if isinstance(self.paginator, CursorPagination):
+            return super().list(request, *args, **kwargs)
+        scopes = self.list_cache_scopes(request)
+        url = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        etag = (getattr(self, 'list_etag', None) or '').strip('"')
+        key = f"api:list:{':'.join(scopes)}:{':'.join(generations(scopes))}:{etag}:{url}"
+        cache = get_cache()
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=settings.API_RESPONSE_CACHE['TIMEOUT'])
+        return response
@@ -0,0 +1,50 @@
+"""
+Full text search over halls.
+On PostgreSQL every hall keeps a `search_vector` (project id, salesman username and email) behind a GIN index.
+A generated column can not read the user table, so the vector is written together with the hall
+and again when the salesman's username or email changes. Other databases fall back to plain lookups.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db import connections
+from django.db.models import Q, TextField, Value
+from django.db.models.functions import Cast
+from rest_framework import filters
+
+
+SEARCH_CONFIG = 'simple'
+
+
+def uses_search_vector(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def update_search_vectors(halls, salesman):
+    """
+    Rewrites search_vector of `halls` - all of them must belong to `salesman`.
+    """
+    if not uses_search_vector(halls):
+        return
+    halls.update(search_vector=SearchVector(
+        Cast('project_id', TextField()),
+        Value(salesman.username if salesman else ''),
+        Value(salesman.email if salesman else ''),
+        config=SEARCH_CONFIG,
+    ))
+
+
+class HallSearchFilter(filters.SearchFilter):
+    """
+    `?search=` over project id and salesman - an indexed tsvector match on PostgreSQL.
+    """
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        if uses_search_vector(queryset):
+            return queryset.filter(search_vector=SearchQuery(' '.join(search_terms), config=SEARCH_CONFIG))
+        for term in search_terms:
+            condition = Q(salesman__username__icontains=term) | Q(salesman__email__icontains=term)
+            if term.isdigit():
+                condition |= Q(project_id=int(term))
+            queryset = queryset.filter(condition)
+        return queryset
@@ -1,5 +1,13 @@
+import itertools
+
 from rest_framework import serializers
-from .models import Hall, MaterialsPrices, MaterialsAmount, User
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import search, signals, valuation
+from .models import Hall, MaterialsPrices, MaterialsAmount, User, ValuationJob
 
 
 class LoginRegisterSerializer(serializers.ModelSerializer):
@@ -10,9 +18,17 @@ class LoginRegisterSerializer(serializers.ModelSerializer):
             'username',
             'password',
             'token',
+            'refresh_token',
         ]
         extra_kwargs = {'password': {'required': True, 'write_only': True}}
-        read_only_fields = ['token']
+        read_only_fields = ['token', 'refresh_token']
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """
+    Serializer for token refresh endpoint.
+    """
+    refresh_token = serializers.CharField(required=True)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -57,7 +73,188 @@ class HallSerializer(serializers.ModelSerializer):
             'update_date',
             'calculated_value',
         ]
-        read_only_fields = ['project_id']
+        read_only_fields = ['project_id', 'calculated_value']
+
+
+class MaterialLineListSerializer(serializers.ListSerializer):
+    def validate(self, attrs):
+        materials = [line['material'] for line in attrs]
+        if len(materials) != len(set(materials)):
+            raise serializers.ValidationError('Every material can be listed only once.')
+        return attrs
+
+
+class MaterialLineSerializer(serializers.Serializer):
+    """
+    One bill of materials line in bulk payloads - materials are checked against context['prices'].
+    """
+    material = serializers.IntegerField()
+    amount = serializers.IntegerField(min_value=-32768, max_value=32767)
+
+    class Meta:
+        list_serializer_class = MaterialLineListSerializer
+
+    def validate_material(self, value):
+        if value not in self.context['prices']:
+            raise serializers.ValidationError('Material does not exist.')
+        return value
+
+
+class HallBulkListSerializer(serializers.ListSerializer):
+    """
+    Validates every hall on its own - invalid ones end up in item_errors (and as {} in validated_data)
+    instead of failing the whole list. create() writes all valid ones in one transaction.
+    """
+    def to_internal_value(self, data):
+        if not isinstance(data, list) or not data:
+            raise serializers.ValidationError({'non_field_errors': ['Expected a non-empty list of halls.']})
+        self.item_errors = []
+        validated = []
+        project_ids = set()
+        for item in data:
+            try:
+                item = self.child.run_validation(item)
+                if item.get('project_id') in project_ids:
+                    raise serializers.ValidationError({'project_id': ['Project repeated in the list.']})
+                if 'project_id' in item:
+                    project_ids.add(item['project_id'])
+                validated.append(item)
+                self.item_errors.append({})
+            except serializers.ValidationError as exc:
+                validated.append({})
+                self.item_errors.append(exc.detail)
+        return validated
+
+    def create(self, validated_data):
+        salesman = self.context['request'].user
+        prices = self.context['prices']
+        fields = ['length', 'width', 'pole_height', 'roof_slope']
+        halls = []
+        for item, errors in zip(validated_data, self.item_errors):
+            if errors:
+                halls.append(None)
+                continue
+            lines = [(line['material'], line['amount']) for line in item.get('materials', [])]
+            halls.append(Hall(
+                project_id=item.get('project_id'),
+                salesman=salesman,
+                update_date=timezone.localdate(),
+                updated_at=timezone.now(),
+                calculated_value=valuation.value_from_prices(item['length'], item['width'], lines, prices),
+                **{field: item[field] for field in fields}
+            ))
+        created = [hall for hall in halls if hall is not None and hall.project_id is None]
+        updated = [hall for hall in halls if hall is not None and hall.project_id is not None]
+
+        with transaction.atomic(), signals.valuation_muted():
+            Hall.objects.bulk_create(created, batch_size=settings.HALL_RECALCULATE_BATCH_SIZE)
+            Hall.objects.bulk_update(
+                updated,
+                fields + ['calculated_value', 'update_date', 'updated_at'],
+                batch_size=settings.HALL_RECALCULATE_BATCH_SIZE,
+            )
+            MaterialsAmount.objects.filter(project__in=[hall.project_id for hall in updated]).delete()
+            MaterialsAmount.objects.bulk_create(
+                [
+                    MaterialsAmount(project=hall, material_id=line['material'], amount=line['amount'])
+                    for hall, item in zip(halls, validated_data) if hall is not None
+                    for line in item.get('materials', [])
+                ],
+                batch_size=settings.HALL_RECALCULATE_BATCH_SIZE,
+            )
+            search.update_search_vectors(Hall.objects.filter(pk__in=[hall.pk for hall in created]), salesman)
+        return halls
+
+
+class HallBulkSerializer(serializers.ModelSerializer):
+    """
+    Hall with nested material lines for the bulk endpoint.
+    With `project_id` of an own hall (context['owned']) the hall and its lines are replaced.
+    """
+    project_id = serializers.IntegerField(required=False)
+    materials = MaterialLineSerializer(many=True, required=False)
+
+    class Meta:
+        model = Hall
+        list_serializer_class = HallBulkListSerializer
+        fields = [
+            'project_id',
+            'length',
+            'width',
+            'pole_height',
+            'roof_slope',
+            'materials',
+        ]
+
+    def validate_project_id(self, value):
+        if value not in self.context['owned']:
+            raise serializers.ValidationError('Project not found.')
+        return value
+
+
+class HallVariantSerializer(serializers.ModelSerializer):
+    """
+    Dimensions of an unsaved hall - validated like HallSerializer.
+    """
+    class Meta:
+        model = Hall
+        fields = [
+            'length',
+            'width',
+            'pole_height',
+            'roof_slope',
+        ]
+
+
+class HallGridSerializer(serializers.Serializer):
+    """
+    Lists of values per dimension - every combination is one variant.
+    """
+    length = serializers.ListField(child=serializers.DecimalField(max_digits=5, decimal_places=2), allow_empty=False)
+    width = serializers.ListField(child=serializers.DecimalField(max_digits=5, decimal_places=2), allow_empty=False)
+    pole_height = serializers.ListField(
+        child=serializers.DecimalField(max_digits=4, decimal_places=2),
+        allow_empty=False,
+    )
+    roof_slope = serializers.ListField(
+        child=serializers.IntegerField(min_value=-32768, max_value=32767),
+        allow_empty=False,
+    )
+
+
+class HallQuoteSerializer(serializers.Serializer):
+    """
+    What-if valuation of `variants` or of a `grid`, with an optional bill of materials.
+    Materials are checked against context['prices'].
+    """
+    variants = HallVariantSerializer(many=True, required=False, max_length=settings.HALL_QUOTE_MAX_VARIANTS)
+    grid = HallGridSerializer(required=False)
+    materials = MaterialLineSerializer(many=True, required=False)
+    takeoff = serializers.BooleanField(default=False)
+    as_of = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        if ('variants' in attrs) == ('grid' in attrs):
+            raise serializers.ValidationError('Send either variants or grid.')
+        if 'grid' in attrs:
+            count = 1
+            for values in attrs['grid'].values():
+                count *= len(values)
+        else:
+            count = len(attrs['variants'])
+        if not count or count > settings.HALL_QUOTE_MAX_VARIANTS:
+            raise serializers.ValidationError(f'Quote between 1 and {settings.HALL_QUOTE_MAX_VARIANTS} variants.')
+        return attrs
+
+    def get_variants(self):
+        """
+        Variant dicts in request order - the grid expanded by length, width, pole_height, roof_slope.
+        """
+        if 'variants' in self.validated_data:
+            return self.validated_data['variants']
+        fields = ['length', 'width', 'pole_height', 'roof_slope']
+        grid = self.validated_data['grid']
+        return [dict(zip(fields, values)) for values in itertools.product(*(grid[field] for field in fields))]
 
 
 class MaterialsPricesSerializer(serializers.ModelSerializer):
@@ -87,3 +284,22 @@ class MaterialsAmountSerializer(serializers.ModelSerializer):
         instance.amount = validated_data.get('amount', instance.amount)
         instance.save()
         return instance
+
+
+class ValuationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ValuationJob
+        fields = [
+            'job_id',
+            'kind',
+            'status',
+            'hall',
+            'materials',
+            'calculated_value',
+            'updated',
+            'error',
+            'created_at',
+            'started_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
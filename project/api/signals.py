@@ -0,0 +1,214 @@
+"""
+Keeps Hall.calculated_value, hall search vectors, the price cache, cached list responses
+and issued tokens up to date.
+Every write of a hall, a material line or a price applies only the difference it makes to the affected halls.
+Bulk queryset operations (update(), bulk_create(), bulk_update()) do not send signals - code using them
+has to keep the values (and response_cache) right by itself, see valuation.py.
+The same goes for writes inside valuation_muted().
+"""
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import price_history, response_cache, search, valuation
+from .jwt import user_cache
+from .prices import price_cache
+from .models import Hall, MaterialsPrices, MaterialsAmount, User
+
+
+_local = threading.local()
+
+
+@contextmanager
+def valuation_muted():
+    """
+    Material line writes inside the block leave calculated_value alone - for callers valuing the halls themselves.
+    """
+    _local.muted = getattr(_local, 'muted', 0) + 1
+    try:
+        yield
+    finally:
+        _local.muted -= 1
+
+
+def is_muted():
+    return getattr(_local, 'muted', 0) > 0
+
+
+@receiver(pre_save, sender=Hall)
+def hall_pre_save(sender, instance, raw=False, **kwargs):
+    instance._search_outdated = True
+    instance._old_salesman_id = None
+    if raw:
+        return
+    if instance._state.adding:
+        if instance.calculated_value is None:
+            instance.calculated_value = valuation.base_value(instance.length, instance.width)
+        return
+    old = Hall.objects.filter(pk=instance.pk).values('length', 'width', 'calculated_value', 'salesman_id').first()
+    if old is None:
+        return
+    instance._search_outdated = old['salesman_id'] != instance.salesman_id
+    instance._old_salesman_id = old['salesman_id']
+    if old['calculated_value'] is None:
+        return
+    # Always from the stored value - an instance loaded earlier would otherwise write back a value that
+    # misses the price and line deltas applied since.
+    old_base = valuation.base_value(old['length'], old['width'])
+    new_base = valuation.base_value(instance.length, instance.width)
+    instance.calculated_value = old['calculated_value'] + new_base - old_base
+
+
+@receiver(post_save, sender=Hall)
+def hall_post_save(sender, instance, raw=False, **kwargs):
+    if getattr(instance, '_search_outdated', True):
+        search.update_search_vectors(Hall.objects.filter(pk=instance.pk), instance.salesman)
+    if raw or instance.calculated_value is not None:
+        return
+    instance.calculated_value = valuation.calculate_value(instance)
+    Hall.objects.filter(pk=instance.pk).update(calculated_value=instance.calculated_value, updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Hall)
+@receiver(post_delete, sender=Hall)
+def hall_list_changed(sender, instance, **kwargs):
+    response_cache.invalidate_halls([instance.salesman_id, getattr(instance, '_old_salesman_id', None)])
+
+
+@receiver(pre_save, sender=MaterialsAmount)
+def amount_pre_save(sender, instance, raw=False, **kwargs):
+    instance._old_line = None
+    if raw or instance._state.adding or is_muted():
+        return
+    old = MaterialsAmount.objects.filter(pk=instance.pk).values('project_id', 'amount', 'material__price').first()
+    if old is not None:
+        instance._old_line = (old['project_id'], valuation.line_value(old['amount'], old['material__price']))
+
+
+@receiver(post_save, sender=MaterialsAmount)
+def amount_post_save(sender, instance, raw=False, **kwargs):
+    if raw or is_muted():
+        return
+    new_value = valuation.line_value(instance.amount, instance.material.price if instance.material_id else None)
+    old_line = getattr(instance, '_old_line', None)
+    if old_line is None:
+        valuation.apply_delta(instance.project_id, new_value)
+    elif old_line[0] == instance.project_id:
+        valuation.apply_delta(instance.project_id, new_value - old_line[1])
+    else:
+        valuation.apply_delta(old_line[0], -old_line[1])
+        valuation.apply_delta(instance.project_id, new_value)
+
+
+@receiver(post_delete, sender=MaterialsAmount)
+def amount_post_delete(sender, instance, origin=None, **kwargs):
+    if is_muted():
+        return
+    if isinstance(origin, Hall) or getattr(origin, 'model', None) is Hall:
+        # Lines deleted together with their hall - nothing left to value.
+        return
+    old_value = valuation.line_value(instance.amount, instance.material.price if instance.material_id else None)
+    valuation.apply_delta(instance.project_id, -old_value)
+
+
+@receiver(post_save, sender=MaterialsAmount)
+@receiver(post_delete, sender=MaterialsAmount)
+def amount_list_changed(sender, instance, origin=None, **kwargs):
+    if is_muted() or isinstance(origin, Hall) or getattr(origin, 'model', None) is Hall:
+        return
+    old_line = getattr(instance, '_old_line', None)
+    project_ids = {instance.project_id, old_line[0] if old_line else None}
+    response_cache.invalidate_halls(Hall.objects.filter(pk__in=project_ids).values_list('salesman_id', flat=True))
+
+
+@receiver(pre_save, sender=MaterialsPrices)
+def price_pre_save(sender, instance, raw=False, **kwargs):
+    instance._old_price = None
+    if raw or instance._state.adding:
+        return
+    instance._old_price = MaterialsPrices.objects.filter(pk=instance.pk).values_list('price', flat=True).first()
+
+
+@receiver(post_save, sender=MaterialsPrices)
+def price_post_save(sender, instance, raw=False, created=False, **kwargs):
+    old_price = getattr(instance, '_old_price', None)
+    if raw or created or old_price is None:
+        return
+    valuation.apply_price_delta(instance.pk, Decimal(instance.price) - old_price)
+
+
+@receiver(post_save, sender=MaterialsPrices)
+def price_history_changed(sender, instance, raw=False, created=False, **kwargs):
+    if raw or (not created and getattr(instance, '_old_price', None) == Decimal(instance.price)):
+        return
+    price_history.record({instance.pk: instance.price}, instance.updated_at)
+
+
+@receiver(pre_delete, sender=MaterialsPrices)
+def price_pre_delete(sender, instance, **kwargs):
+    # Lines keep their amount but lose the material (SET_NULL), so they stop counting.
+    valuation.apply_price_delta(instance.pk, -instance.price)
+    # SET_NULL is a plain UPDATE - touch the lines so their conditional GETs see the change.
+    now = timezone.now()
+    MaterialsAmount.objects.filter(material=instance.pk).update(updated_at=now, update_date=timezone.localdate(now))
+
+
+@receiver(post_save, sender=MaterialsPrices)
+@receiver(post_delete, sender=MaterialsPrices)
+def price_table_changed(sender, **kwargs):
+    price_cache.invalidate()
+
+
+@receiver(post_save, sender=MaterialsPrices)
+@receiver(pre_delete, sender=MaterialsPrices)
+def price_list_changed(sender, instance, signal=None, **kwargs):
+    response_cache.invalidate(response_cache.PRICES)
+    old_price = getattr(instance, '_old_price', None)
+    if signal is post_save and (old_price is None or old_price == instance.price):
+        return
+    response_cache.invalidate_halls(
+        Hall.objects.filter(materialsamount__material=instance.pk).values_list('salesman_id', flat=True).distinct()
+    )
+
+
+@receiver(pre_save, sender=User)
+def user_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._search_outdated = False
+    instance._revoke_tokens = False
+    if raw or instance._state.adding:
+        return
+    old = User.objects.filter(pk=instance.pk).values(
+        'password', 'is_active', 'is_staff', 'is_superuser', 'username', 'email'
+    ).first()
+    if old is None:
+        return
+    instance._search_outdated = (old['username'], old['email']) != (instance.username, instance.email)
+    # Everything a stateless token trusts as a claim - as far as this save writes it.
+    trusted = ['password', 'is_active', 'is_staff', 'is_superuser']
+    if update_fields is not None:
+        trusted = [field for field in trusted if field in update_fields]
+    instance._revoke_tokens = any(old[field] != getattr(instance, field) for field in trusted)
+
+
+@receiver(post_delete, sender=User)
+def user_post_delete(sender, instance, **kwargs):
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_post_save(sender, instance, raw=False, **kwargs):
+    if getattr(instance, '_revoke_tokens', False):
+        # Bumped here rather than on the instance - save(update_fields=[...]) would not write it.
+        User.objects.filter(pk=instance.pk).update(token_version=F('token_version') + 1)
+        instance.refresh_from_db(fields=['token_version'])
+    user_cache.invalidate(instance.pk)
+    if getattr(instance, '_search_outdated', False):
+        # The salesman string is part of every hall representation.
+        Hall.objects.filter(salesman=instance).update(updated_at=timezone.now())
+        response_cache.invalidate_halls([instance.pk])
+        search.update_search_vectors(Hall.objects.filter(salesman=instance), instance)
@@ -0,0 +1,138 @@
+"""
+Structural takeoff of a steel portal frame hall from its geometry.
+A hall is a row of frames (two columns and two rafters each) under a duopitch roof with the ridge along
+its length - `roof_slope` is the pitch in degrees, dimensions are metres. Sections and spacings come from
+the tables below, expanded into per-metre / per-degree lookups when the module is imported, and results
+are memoized per geometry - repeated quotes of standard sizes skip the math.
+The takeoff lists quantities only; calculated_value is still priced from the entered material lines.
+"""
+import math
+from dataclasses import asdict, dataclass
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+from django.conf import settings
+
+
+# (largest span in m, rafter section, kg per m)
+RAFTER_SECTIONS = [
+    (12, 'IPE 240', 30.7),
+    (18, 'IPE 300', 42.2),
+    (24, 'IPE 360', 57.1),
+    (30, 'IPE 450', 77.6),
+    (40, 'IPE 550', 106.0),
+]
+# (largest column height in m, column section, kg per m)
+COLUMN_SECTIONS = [
+    (4, 'HEA 160', 30.4),
+    (6, 'HEA 200', 42.3),
+    (8, 'HEA 240', 60.3),
+    (12, 'HEA 300', 88.3),
+]
+# (largest span in m, frame spacing in m)
+FRAME_SPACINGS = [
+    (15, 6.0),
+    (25, 5.5),
+    (40, 5.0),
+]
+# (largest pitch in degrees, purlin spacing along the rafter in m)
+PURLIN_SPACINGS = [
+    (10, 1.5),
+    (25, 1.8),
+    (90, 2.0),
+]
+MAX_SLOPE = 89
+
+
+def _per_step(table, limit):
+    """
+    Expands a (bound, *values) table into a tuple indexed by whole units 0..limit - values beyond the
+    last bound reuse the last row.
+    """
+    rows = []
+    for step in range(limit + 1):
+        row = next((row for row in table if step <= row[0]), table[-1])
+        rows.append(row[1:])
+    return tuple(rows)
+
+
+RAFTER_BY_SPAN = _per_step(RAFTER_SECTIONS, RAFTER_SECTIONS[-1][0])
+COLUMN_BY_HEIGHT = _per_step(COLUMN_SECTIONS, COLUMN_SECTIONS[-1][0])
+FRAME_SPACING_BY_SPAN = _per_step(FRAME_SPACINGS, FRAME_SPACINGS[-1][0])
+PURLIN_SPACING_BY_SLOPE = _per_step(PURLIN_SPACINGS, MAX_SLOPE)
+# Rafter length per metre of half span and gable height per metre of half span, per whole degree.
+SLOPE_FACTOR = tuple(1 / math.cos(math.radians(degree)) for degree in range(MAX_SLOPE + 1))
+SLOPE_RISE = tuple(math.tan(math.radians(degree)) for degree in range(MAX_SLOPE + 1))
+
+
+def _lookup(table, value):
+    return table[min(max(math.ceil(value), 0), len(table) - 1)]
+
+
+def _round(value):
+    return Decimal(value).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+
+@dataclass(frozen=True)
+class Takeoff:
+    frames: int
+    frame_spacing: Decimal
+    columns: int
+    column_section: str
+    column_length: Decimal
+    rafters: int
+    rafter_section: str
+    rafter_length: Decimal
+    purlins: int
+    purlin_length: Decimal
+    steel_weight: Decimal
+    roof_area: Decimal
+    wall_area: Decimal
+
+    def as_dict(self):
+        return {key: str(value) if isinstance(value, Decimal) else value for key, value in asdict(self).items()}
+
+
+def takeoff(length, width, pole_height, roof_slope):
+    """
+    Takeoff of a hall geometry - the arguments are normalized so 12, 12.0 and '12.00' share a cache entry.
+    """
+    return _takeoff(float(length), float(width), float(pole_height), min(max(int(roof_slope), 0), MAX_SLOPE))
+
+
+@lru_cache(maxsize=settings.TAKEOFF_CACHE_SIZE)
+def _takeoff(length, width, pole_height, slope):
+    rafter_section, rafter_weight = _lookup(RAFTER_BY_SPAN, width)
+    column_section, column_weight = _lookup(COLUMN_BY_HEIGHT, pole_height)
+    (spacing,) = _lookup(FRAME_SPACING_BY_SPAN, width)
+    (purlin_spacing,) = PURLIN_SPACING_BY_SLOPE[slope]
+
+    frames = max(math.ceil(length / spacing), 1) + 1
+    half_rafter = width / 2 * SLOPE_FACTOR[slope]
+    columns = 2 * frames
+    rafters = 2 * frames
+    column_length = columns * pole_height
+    rafter_length = rafters * half_rafter
+    # Purlin rows per roof side, eaves and ridge included, each running the full length.
+    purlins = 2 * (math.ceil(half_rafter / purlin_spacing) + 1)
+    gable = (width / 2) ** 2 * SLOPE_RISE[slope]
+
+    return Takeoff(
+        frames=frames,
+        frame_spacing=_round(length / (frames - 1)),
+        columns=columns,
+        column_section=column_section,
+        column_length=_round(column_length),
+        rafters=rafters,
+        rafter_section=rafter_section,
+        rafter_length=_round(rafter_length),
+        purlins=purlins,
+        purlin_length=_round(purlins * length),
+        steel_weight=_round(column_length * column_weight + rafter_length * rafter_weight),
+        roof_area=_round(2 * half_rafter * length),
+        wall_area=_round(2 * (length + width) * pole_height + 2 * gable),
+    )
+
+
+cache_info = _takeoff.cache_info
+cache_clear = _takeoff.cache_clear
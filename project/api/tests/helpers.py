@@ -0,0 +1,27 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class ConstantQueriesMixin:
+    """
+    Guards list endpoints against N+1 queries.
+    """
+    def assertConstantQueries(self, url, add_rows, sizes=(1, 10), params=None, size_param='page_size'):
+        """
+        Lists `url` with `size` rows on the page for every size and asserts the query count never changes.
+        add_rows(n) has to create n more rows visible under `url`.
+        Pass size_param=None for views without a page size parameter (e.g. admin changelists).
+        """
+        counts = []
+        created = 0
+        for size in sizes:
+            add_rows(size - created)
+            created = size
+            query = dict(params or {})
+            if size_param:
+                query[size_param] = size
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, query)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(len(set(counts)), 1, f'Query count depends on page size: {counts}')
@@ -0,0 +1,103 @@
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from api.jwt import user_cache
+from api.models import Hall, MaterialsPrices, MaterialsAmount, User
+from api import valuation
+
+
+class TestAsyncViews(APITestCase):
+    def setUp(self):
+        cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.other = User.objects.create_user(
+            username='other',
+            email='other@test.com',
+            password='test'
+        )
+        self.steel = MaterialsPrices.objects.create(material='steel', price=Decimal('19.99'))
+        self.bolts = MaterialsPrices.objects.create(material='bolts', price=Decimal('0.35'))
+        self.halls = [
+            Hall.objects.create(salesman=self.user, length=12, width=7, pole_height=5, roof_slope=slope)
+            for slope in range(1, 13)
+        ]
+        MaterialsAmount.objects.create(project=self.halls[0], material=self.steel, amount=120)
+        MaterialsAmount.objects.create(project=self.halls[0], material=self.bolts, amount=1500)
+        Hall.objects.create(salesman=self.other, length=5, width=5, pole_height=5, roof_slope=7)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user.token}')
+
+    def assertSameAsSync(self, async_url, sync_url, params=None):
+        expected = self.client.get(sync_url, params)
+        response = self.client.get(async_url, params)
+        self.assertEqual(response.status_code, expected.status_code)
+        # Same body apart from the next / previous links pointing at the async URLs.
+        self.assertEqual(json.loads(response.content.decode().replace('/api/async/', '/api/')), expected.json())
+        return response
+
+    def test_hall_list(self):
+        self.assertSameAsSync(reverse('async-halls-list'), reverse('halls-list'))
+
+    def test_hall_list_pages(self):
+        for params in [{'page': 2}, {'page': 'last'}, {'page_size': 5, 'page': 2}, {'page': 9}]:
+            with self.subTest(params=params):
+                self.assertSameAsSync(reverse('async-halls-list'), reverse('halls-list'), params)
+
+    def test_hall_list_filters(self):
+        for params in [{'roof_slope_min': 10}, {'search': str(self.halls[3].pk)}, {'search': 'other'}]:
+            with self.subTest(params=params):
+                self.assertSameAsSync(reverse('async-halls-list'), reverse('halls-list'), params)
+
+    def test_hall_detail(self):
+        hall = self.halls[0]
+        self.assertSameAsSync(reverse('async-halls-detail', args=[hall.pk]), reverse('halls-detail', args=[hall.pk]))
+
+    def test_hall_detail_of_other_salesman(self):
+        hall = Hall.objects.get(salesman=self.other)
+        response = self.client.get(reverse('async-halls-detail', args=[hall.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_calculate(self):
+        hall = self.halls[0]
+        Hall.objects.filter(pk=hall.pk).update(calculated_value=None)
+        response = self.client.get(reverse('async-halls-calculate', args=[hall.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        hall.refresh_from_db()
+        self.assertEqual(hall.calculated_value, valuation.calculate_value(hall))
+        self.assertEqual(response.json(), self.client.get(reverse('halls-calculate', args=[hall.pk])).json())
+
+    def test_price_list(self):
+        for number in range(12):
+            MaterialsPrices.objects.create(material=f'material {number}', price=number)
+        for params in [None, {'page': 2}]:
+            with self.subTest(params=params):
+                self.assertSameAsSync(reverse('async-prices-list'), reverse('prices-list'), params)
+
+    def test_requires_token(self):
+        self.client.credentials()
+        response = self.client.get(reverse('async-halls-list'))
+        self.assertEqual(response.status_code, self.client.get(reverse('halls-list')).status_code)
+
+    def test_password_change_invalidates_token(self):
+        self.user.set_password('changed')
+        self.user.save()
+        response = self.client.get(reverse('async-halls-list'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(JWT_AUTH=dict(settings.JWT_AUTH, MODE='stateless'))
+    def test_stateless_mode(self):
+        self.client.get(reverse('async-prices-list'))
+        # Only the price table stamp.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('async-prices-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
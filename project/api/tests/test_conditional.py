@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+from rest_framework.test import APITestCase
+from rest_framework import status
+from api.models import Hall, MaterialsPrices, MaterialsAmount, User
+
+
+class TestConditionalGet(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.client.force_authenticate(self.user)
+        self.steel = MaterialsPrices.objects.create(material='steel', price=10)
+        self.hall = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+
+    def assertNotModifiedUntilChange(self, url, change):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_hall_list(self):
+        self.assertNotModifiedUntilChange(
+            reverse('halls-list'),
+            lambda: MaterialsAmount.objects.create(project=self.hall, material=self.steel, amount=3),
+        )
+
+    def test_hall_list_delete(self):
+        Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+        self.assertNotModifiedUntilChange(reverse('halls-list'), self.hall.delete)
+
+    def test_hall_list_ignores_if_modified_since(self):
+        other = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+        response = self.client.get(reverse('halls-list'))
+        self.assertNotIn('Last-Modified', response)
+        since = http_date(other.updated_at.timestamp() + 1)
+        # The newest updated_at stays the same when an older hall goes.
+        self.hall.delete()
+        response = self.client.get(reverse('halls-list'), HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_hall_list_cursor(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertNotModifiedUntilChange(
+                reverse('halls-list') + '?pagination=cursor',
+                lambda: MaterialsAmount.objects.create(project=self.hall, material=self.steel, amount=3),
+            )
+        self.assertFalse([query for query in queries if 'MAX(' in query['sql'].upper()])
+
+    def test_hall_detail(self):
+        def change():
+            self.hall.roof_slope = 12
+            self.hall.save()
+        self.assertNotModifiedUntilChange(reverse('halls-detail', args=[self.hall.pk]), change)
+
+    def test_hall_detail_price_change(self):
+        MaterialsAmount.objects.create(project=self.hall, material=self.steel, amount=3)
+
+        def change():
+            self.steel.price = 12
+            self.steel.save()
+        self.assertNotModifiedUntilChange(reverse('halls-detail', args=[self.hall.pk]), change)
+
+    def test_price_list(self):
+        def change():
+            self.steel.price = 12
+            self.steel.save()
+        self.assertNotModifiedUntilChange(reverse('prices-list'), change)
+
+    def test_amount_list(self):
+        line = MaterialsAmount.objects.create(project=self.hall, material=self.steel, amount=3)
+
+        def change():
+            line.amount = 4
+            line.save()
+        self.assertNotModifiedUntilChange(reverse('amounts-list') + f'?project_id={self.hall.pk}', change)
+
+    def test_amount_detail_material_deleted(self):
+        line = MaterialsAmount.objects.create(project=self.hall, material=self.steel, amount=3)
+        self.assertNotModifiedUntilChange(reverse('amounts-detail', args=[line.pk]), self.steel.delete)
+        self.assertIsNone(self.client.get(reverse('amounts-detail', args=[line.pk])).data['material'])
+
+    def test_etag_depends_on_query(self):
+        first = self.client.get(reverse('halls-list'))
+        second = self.client.get(reverse('halls-list'), {'roof_slope_min': 1})
+        self.assertNotEqual(first['ETag'], second['ETag'])
@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+from decimal import Decimal
+from unittest import mock
+
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from api.models import Hall, MaterialsPrices, MaterialsAmount, User
+from api import exports
+
+
+class TestExport(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.other = User.objects.create_user(
+            username='other',
+            email='other@test.com',
+            password='test'
+        )
+        self.client.force_authenticate(self.user)
+        self.steel = MaterialsPrices.objects.create(material='steel', price=Decimal('19.99'))
+        self.bolts = MaterialsPrices.objects.create(material='bolts', price=Decimal('0.35'))
+        self.first = Hall.objects.create(salesman=self.user, length=12, width=7, pole_height=5, roof_slope=7)
+        self.empty = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=12)
+        self.last = Hall.objects.create(salesman=self.user, length=8, width=6, pole_height=4, roof_slope=7)
+        MaterialsAmount.objects.create(project=self.first, material=self.steel, amount=120)
+        MaterialsAmount.objects.create(project=self.first, material=self.bolts, amount=1500)
+        MaterialsAmount.objects.create(project=self.last, material=self.bolts, amount=300)
+        foreign = Hall.objects.create(salesman=self.other, length=5, width=5, pole_height=5, roof_slope=7)
+        MaterialsAmount.objects.create(project=foreign, material=self.steel, amount=1)
+
+    def export(self, **params):
+        response = self.client.get(reverse('halls-export'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(
+            [(int(row['project_id']), row['material_name'], row['amount']) for row in rows],
+            [
+                (self.first.pk, 'steel', '120'),
+                (self.first.pk, 'bolts', '1500'),
+                (self.empty.pk, '', ''),
+                (self.last.pk, 'bolts', '300'),
+            ],
+        )
+        self.assertEqual(rows[0]['salesman'], 'test@test.com')
+        self.assertEqual(rows[0]['length'], '12.00')
+
+    def test_ndjson(self):
+        response, content = self.export(export_format='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        halls = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([hall['project_id'] for hall in halls], [self.first.pk, self.empty.pk, self.last.pk])
+        self.assertEqual(halls[0]['materials'], [
+            {'material': self.steel.pk, 'material_name': 'steel', 'amount': 120},
+            {'material': self.bolts.pk, 'material_name': 'bolts', 'amount': 1500},
+        ])
+        self.assertEqual(halls[1]['materials'], [])
+
+    def test_filters_apply(self):
+        _, content = self.export(export_format='ndjson', roof_slope_min=10)
+        self.assertEqual([json.loads(line)['project_id'] for line in content.splitlines()], [self.empty.pk])
+
+    def test_hall_gone_between_queries(self):
+        values = exports.hall_reader.values
+        # The hall query no longer sees the first hall, the line query (run first) still did.
+        with mock.patch.object(exports.hall_reader, 'values', lambda halls: values(halls.exclude(pk=self.first.pk))):
+            halls = list(exports.halls_with_lines(Hall.objects.filter(salesman=self.user)))
+        self.assertEqual([hall['project_id'] for hall, _ in halls], [self.empty.pk, self.last.pk])
+        self.assertEqual(halls[1][1], [{'material': self.bolts.pk, 'material_name': 'bolts', 'amount': 300}])
+
+    def test_constant_queries(self):
+        with self.assertNumQueries(2):
+            self.export()
+        for _ in range(5):
+            hall = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+            MaterialsAmount.objects.create(project=hall, material=self.steel, amount=3)
+        with self.assertNumQueries(2):
+            self.export()
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse('halls-export'), {'export_format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,137 @@
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from rest_framework.test import APITestCase
+from rest_framework import status
+from api.models import Hall, MaterialsPrices, MaterialsAmount, PriceTableVersion, User
+from api import valuation
+from api.prices import price_cache
+
+
+class APITestImportHelper(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(
+            username='admin',
+            email='admin@test.com',
+            password='admin'
+        )
+        self.user = User.objects.create_user(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.steel = MaterialsPrices.objects.create(material='steel', price=Decimal('19.99'))
+        self.bolts = MaterialsPrices.objects.create(material='bolts', price=Decimal('0.35'))
+        self.hall = Hall.objects.create(salesman=self.user, length=12, width=7, pole_height=5, roof_slope=7)
+        self.other = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+        MaterialsAmount.objects.create(project=self.hall, material=self.steel, amount=120)
+        MaterialsAmount.objects.create(project=self.other, material=self.bolts, amount=100)
+
+    def upload(self, content):
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                '/api/prices/import',
+                {'file': SimpleUploadedFile('prices.csv', content.encode(), content_type='text/csv')},
+                format='multipart',
+            )
+
+
+class TestImportPrices(APITestImportHelper):
+
+    def test_counts(self):
+        response = self.upload(
+            'material,price\n'
+            'steel,21.50\n'
+            'bolts,0.35\n'
+            'paint,45.10\n'
+            ',3\n'
+            'glass,abc\n'
+            'paint,46\n'
+            'roofing,1.005\n'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            (response.data['inserted'], response.data['updated'], response.data['unchanged'], response.data['rejected']),
+            (1, 1, 1, 4),
+        )
+        self.assertEqual([error['line'] for error in response.data['errors']], [5, 6, 7, 8])
+        self.assertEqual(
+            dict(MaterialsPrices.objects.values_list('material', 'price')),
+            {'steel': Decimal('21.50'), 'bolts': Decimal('0.35'), 'paint': Decimal('45.10')},
+        )
+        self.assertEqual(MaterialsPrices.objects.get(material='steel').pk, self.steel.pk)
+
+    def test_revalues_affected_halls_once(self):
+        with mock.patch('api.valuation.recalculate_halls', wraps=valuation.recalculate_halls) as recalculate:
+            response = self.upload('material,price\nsteel,21.50\nbolts,0.40\npaint,45.10\n')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recalculate.assert_called_once()
+        self.assertEqual(recalculate.call_args.kwargs['materials'], sorted([self.steel.pk, self.bolts.pk]))
+        for hall in Hall.objects.all():
+            self.assertEqual(hall.calculated_value, valuation.calculate_value(hall))
+        self.assertEqual(price_cache.prices()[self.steel.pk], Decimal('21.50'))
+
+    def test_unchanged_prices_skip_revaluation(self):
+        with mock.patch('api.valuation.recalculate_halls') as recalculate:
+            self.upload('material,price\nsteel,19.99\npaint,45.10\n')
+        recalculate.assert_not_called()
+
+    def test_hall_list_sees_new_values(self):
+        self.client.force_authenticate(self.user)
+        before = self.client.get('/api/halls').data['results']
+        self.upload('material,price\nsteel,21.50\n')
+        self.client.force_authenticate(self.user)
+        after = self.client.get('/api/halls').data['results']
+        self.assertNotEqual(before, after)
+
+    def test_chunks(self):
+        rows = ''.join(f'material {number},{number}.25\n' for number in range(25))
+        with self.settings(PRICE_IMPORT_CHUNK_SIZE=10):
+            response = self.upload('material,price\n' + rows)
+        self.assertEqual(response.data['inserted'], 25)
+        self.assertEqual(MaterialsPrices.objects.count(), 27)
+
+    def test_bad_header(self):
+        response = self.upload('name,cost\nsteel,1\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/prices/import', {
+            'file': SimpleUploadedFile('prices.csv', b'material,price\nsteel,1\n', content_type='text/csv'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write('material,price\nsteel,22.00\nnails,0.10\nbad,\n')
+        self.addCleanup(os.unlink, csv_file.name)
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_prices', csv_file.name, stdout=out, stderr=io.StringIO())
+        self.assertIn('Inserted 1, updated 1, unchanged 0, rejected 1', out.getvalue())
+        self.hall.refresh_from_db()
+        self.assertEqual(self.hall.calculated_value, valuation.calculate_value(self.hall))
+
+    def test_command_replaces_price_stamp(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as csv_file:
+            csv_file.write('material,price\nsteel,22.00\n')
+        self.addCleanup(os.unlink, csv_file.name)
+        self.client.force_authenticate(self.user)
+        etag = self.client.get('/api/prices', {'material': 'steel'})['ETag']
+        before = PriceTableVersion.objects.get().stamp
+        # Nothing after the commit is needed - the command process may share no cache with the web.
+        with self.captureOnCommitCallbacks(execute=False):
+            call_command('import_prices', csv_file.name, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertNotEqual(PriceTableVersion.objects.get().stamp, before)
+        response = self.client.get('/api/prices', {'material': 'steel'})
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['price'], '22.00')
@@ -0,0 +1,158 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from api.models import Hall, MaterialsPrices, MaterialsAmount, PriceTableVersion, User, ValuationJob
+from api import imports, jobs, valuation
+
+
+JOBS_ENABLED = dict(settings.VALUATION_JOBS, ENABLED=True)
+
+
+class JobsHelper:
+    def create_data(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.steel = MaterialsPrices.objects.create(material='steel', price=Decimal('19.99'))
+        self.hall = Hall.objects.create(salesman=self.user, length=12, width=7, pole_height=5, roof_slope=7)
+        MaterialsAmount.objects.create(project=self.hall, material=self.steel, amount=120)
+        Hall.objects.filter(pk=self.hall.pk).update(calculated_value=None)
+
+
+@override_settings(VALUATION_JOBS=JOBS_ENABLED)
+class TestValuationJobs(JobsHelper, APITestCase):
+    def setUp(self):
+        self.create_data()
+        self.client.force_authenticate(self.user)
+
+    def test_calculate_enqueues_and_polls(self):
+        response = self.client.get(reverse('halls-calculate', args=[self.hall.pk]))
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], ValuationJob.QUEUED)
+        self.hall.refresh_from_db()
+        self.assertIsNone(self.hall.calculated_value)
+
+        self.assertEqual(jobs.work(once=True), 1)
+        response = self.client.get(response['Location'])
+        self.assertEqual(response.data['status'], ValuationJob.DONE)
+        self.hall.refresh_from_db()
+        self.assertEqual(self.hall.calculated_value, valuation.calculate_value(self.hall))
+        self.assertEqual(Decimal(response.data['calculated_value']), self.hall.calculated_value)
+
+    def test_worker_sees_writes_of_other_processes(self):
+        # The worker loaded the prices, then a web process changed one - only the database is shared.
+        valuation.calculate_value(self.hall)
+        MaterialsPrices.objects.filter(pk=self.steel.pk).update(price=Decimal('25.00'))
+        PriceTableVersion.objects.update(stamp='web')
+        self.client.get(reverse('halls-list'))
+        jobs.enqueue_calculation(self.hall)
+        with mock.patch('api.response_cache.invalidate'), mock.patch('api.response_cache.ainvalidate_halls'):
+            self.assertEqual(jobs.work(once=True), 1)
+        self.hall.refresh_from_db()
+        self.assertEqual(self.hall.calculated_value, 12 * 7 * valuation.BASE_RATE + 120 * Decimal('25.00'))
+        response = self.client.get(reverse('halls-list'))
+        self.assertEqual(Decimal(response.data['results'][0]['calculated_value']), self.hall.calculated_value)
+
+    def test_queued_calculation_is_reused(self):
+        first = self.client.get(reverse('halls-calculate', args=[self.hall.pk]))
+        second = self.client.get(reverse('halls-calculate', args=[self.hall.pk]))
+        self.assertEqual(first.data['job_id'], second.data['job_id'])
+
+    def test_recalculate_enqueues(self):
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.post(reverse('halls-recalculate'), {'materials': [self.steel.pk]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        jobs.work(once=True)
+        job = ValuationJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual((job.status, job.updated), (ValuationJob.DONE, 1))
+
+    def test_async_calculate_enqueues(self):
+        response = self.client.get(
+            f'/api/async/halls/{self.hall.pk}/calculate',
+            HTTP_AUTHORIZATION=f'Bearer {self.user.token}',
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.json()['status'], ValuationJob.QUEUED)
+        self.assertTrue(response['Location'].endswith(reverse('jobs-detail', args=[response.json()['job_id']])))
+        self.hall.refresh_from_db()
+        self.assertIsNone(self.hall.calculated_value)
+
+    def test_price_import_enqueues(self):
+        valuation.recalculate_halls()
+        with self.captureOnCommitCallbacks(execute=True):
+            result = imports.import_prices(['material,price', 'steel,25.00'], user=self.user)
+        self.assertEqual(result.as_dict()['job'], result.job.job_id)
+        self.hall.refresh_from_db()
+        self.assertNotEqual(self.hall.calculated_value, valuation.calculate_value(self.hall))
+        jobs.work(once=True)
+        self.hall.refresh_from_db()
+        self.assertEqual(self.hall.calculated_value, valuation.calculate_value(self.hall))
+
+    def test_claims_oldest_open_job(self):
+        other = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+        first = jobs.enqueue_calculation(self.hall)
+        second = jobs.enqueue_calculation(other)
+        self.assertEqual(jobs.claim(), first)
+        self.assertEqual(jobs.claim(), second)
+        self.assertIsNone(jobs.claim())
+
+    def test_stale_running_job_is_retried(self):
+        job = jobs.enqueue_calculation(self.hall)
+        jobs.claim()
+        ValuationJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.claim(), job)
+        ValuationJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1), attempts=3)
+        self.assertIsNone(jobs.claim())
+        self.assertEqual(ValuationJob.objects.get(pk=job.pk).status, ValuationJob.FAILED)
+
+    def test_failure_is_recorded(self):
+        job = jobs.enqueue_recalculation(materials=['not a material'])
+        with self.assertLogs('api.jobs', 'ERROR'):
+            jobs.work(once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ValuationJob.FAILED)
+        self.assertTrue(job.error)
+
+    def test_jobs_are_private(self):
+        job = jobs.enqueue_calculation(self.hall, self.user)
+        other = User.objects.create_user(username='other', email='other@test.com', password='test')
+        self.client.force_authenticate(other)
+        response = self.client.get(reverse('jobs-detail', args=[job.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(VALUATION_JOBS=dict(settings.VALUATION_JOBS, ENABLED=False))
+    def test_disabled_calculates_in_request(self):
+        response = self.client.get(reverse('halls-calculate', args=[self.hall.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(ValuationJob.objects.exists())
+
+
+class TestValuationWorkerCommand(JobsHelper, TransactionTestCase):
+    def setUp(self):
+        self.create_data()
+
+    def test_worker_drains_queue(self):
+        for _ in range(3):
+            hall = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+            jobs.enqueue_calculation(hall)
+        jobs.enqueue_calculation(self.hall)
+        out = StringIO()
+        call_command('valuation_worker', '--workers', '2', '--once', stdout=out)
+        self.assertIn('Ran 4 jobs.', out.getvalue())
+        self.assertFalse(ValuationJob.objects.exclude(status=ValuationJob.DONE).exists())
+        self.hall.refresh_from_db()
+        self.assertEqual(self.hall.calculated_value, valuation.calculate_value(self.hall))
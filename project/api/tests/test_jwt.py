@@ -0,0 +1,164 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIRequestFactory
+from rest_framework import exceptions, status
+from api import tokens
+from api.jwt import JWTAuthentication, UserCache, user_cache
+from api.models import User
+
+
+class APITestJWTHelper(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.factory = APIRequestFactory()
+
+    def tearDown(self):
+        user_cache.clear()
+
+    def authenticate(self, token):
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return JWTAuthentication().authenticate(request)
+
+
+class TestJWTAuthentication(APITestJWTHelper):
+
+    def test_database_mode(self):
+        token = self.user.token
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate(token)
+        self.assertEqual(user, self.user)
+
+    @override_settings(JWT_AUTH=dict(settings.JWT_AUTH, MODE='cached'))
+    def test_cached_mode_reads_user_once(self):
+        token = self.user.token
+        self.authenticate(token)
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(token)
+        self.assertEqual(user.email, 'test@test.com')
+
+    @override_settings(JWT_AUTH=dict(settings.JWT_AUTH, MODE='cached'))
+    def test_password_change_invalidates_token(self):
+        token = self.user.token
+        self.authenticate(token)
+        self.user.set_password('changed')
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(token)
+        user, _ = self.authenticate(self.user.token)
+        self.assertEqual(user.token_version, 1)
+
+    def test_staff_change_invalidates_token(self):
+        token = self.user.token
+        self.user.is_staff = True
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_superuser_change_invalidates_token(self):
+        token = self.user.token
+        self.user.is_superuser = True
+        self.user.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(token)
+
+    def test_deactivation_with_update_fields_invalidates_token(self):
+        token = self.user.token
+        self.user.is_active = False
+        self.user.save(update_fields=['is_active'])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.token_version, 1)
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(token)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_login_upgrading_password_hash_issues_valid_token(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password('test', hasher='md5'))
+        response = self.client.post(reverse('login'), {'email': 'test@test.com', 'password': 'test'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('pbkdf2_'))
+        user, _ = self.authenticate(response.data['token'])
+        self.assertEqual(user.pk, self.user.pk)
+
+    @override_settings(JWT_AUTH=dict(settings.JWT_AUTH, MODE='cached'))
+    def test_deleted_user_leaves_cache(self):
+        token = self.user.token
+        self.authenticate(token)
+        self.user.delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(token)
+
+    @override_settings(JWT_AUTH=dict(settings.JWT_AUTH, MODE='stateless'))
+    def test_stateless_mode_skips_database(self):
+        token = self.user.token
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(token)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertFalse(user.is_staff)
+
+    def test_change_password_endpoint_reads_user_row(self):
+        with override_settings(JWT_AUTH=dict(settings.JWT_AUTH, MODE='stateless')):
+            self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.user.token}')
+            response = self.client.put(f'/api/users/{self.user.pk}', {
+                'old_password': 'test',
+                'new_password': 'changed',
+            })
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('changed'))
+
+
+class TestUserCache(APITestJWTHelper):
+
+    def test_evicts_least_recently_used(self):
+        cache = UserCache(max_size=1, ttl=60)
+        other = User.objects.create_user(username='other', email='other@test.com', password='test')
+        cache.set(self.user)
+        cache.set(other)
+        self.assertIsNone(cache.get(self.user.pk, 0))
+        self.assertEqual(cache.get(other.pk, 0), other)
+
+    def test_version_mismatch_misses(self):
+        cache = UserCache(max_size=10, ttl=60)
+        cache.set(self.user)
+        self.assertIsNone(cache.get(self.user.pk, 1))
+
+
+class TestTokens(APITestJWTHelper):
+
+    def test_token_signed_once_per_instance(self):
+        with mock.patch('api.tokens.access_token', wraps=tokens.access_token) as access_token:
+            self.assertEqual(self.user.token, self.user.token)
+        self.assertEqual(access_token.call_count, 1)
+
+    def test_refresh_token_is_not_access_token(self):
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate(self.user.refresh_token)
+
+    def test_refresh(self):
+        response = self.client.post(reverse('refresh'), {'refresh_token': self.user.refresh_token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user, _ = self.authenticate(response.data['token'])
+        self.assertEqual(user, self.user)
+
+    def test_refresh_rejects_old_version(self):
+        refresh_token = self.user.refresh_token
+        self.user.set_password('changed')
+        self.user.save()
+        response = self.client.post(reverse('refresh'), {'refresh_token': refresh_token})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rejects_access_token(self):
+        response = self.client.post(reverse('refresh'), {'refresh_token': self.user.token})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
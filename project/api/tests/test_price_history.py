@@ -0,0 +1,105 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from api.models import Hall, MaterialPriceHistory, MaterialsPrices, MaterialsAmount, User
+from api import imports, price_history, valuation
+
+
+class TestPriceHistory(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.steel = MaterialsPrices.objects.create(material='steel', price=Decimal('10.00'))
+        self.bolts = MaterialsPrices.objects.create(material='bolts', price=Decimal('1.00'))
+        self.hall = Hall.objects.create(salesman=self.user, length=10, width=10, pole_height=5, roof_slope=7)
+        MaterialsAmount.objects.create(project=self.hall, material=self.steel, amount=10)
+        MaterialsAmount.objects.create(project=self.hall, material=self.bolts, amount=100)
+        self.before = timezone.now()
+        self.steel.price = Decimal('20.00')
+        self.steel.save()
+
+    def history(self, material):
+        return list(MaterialPriceHistory.objects.filter(material=material).order_by('valid_from').values_list(
+            'price', 'valid_to',
+        ))
+
+    def test_price_change_closes_range(self):
+        history = self.history(self.steel)
+        self.assertEqual([price for price, _ in history], [Decimal('10.00'), Decimal('20.00')])
+        self.assertIsNotNone(history[0][1])
+        self.assertIsNone(history[1][1])
+
+    def test_unchanged_price_not_recorded(self):
+        self.bolts.material = 'nuts'
+        self.bolts.save()
+        self.assertEqual(len(self.history(self.bolts)), 1)
+
+    def test_prices_as_of(self):
+        self.assertEqual(price_history.prices_as_of(self.before), {
+            self.steel.pk: Decimal('10.00'),
+            self.bolts.pk: Decimal('1.00'),
+        })
+        now = timezone.now()
+        self.assertEqual(price_history.prices_as_of(now, [self.steel.pk]), {self.steel.pk: Decimal('20.00')})
+        self.assertEqual(price_history.prices_as_of(self.before - timedelta(days=1)), {})
+
+    def test_calculate_value_as_of(self):
+        base = 10 * 10 * valuation.BASE_RATE
+        self.assertEqual(valuation.calculate_value(self.hall, as_of=self.before), base + 100 + 100)
+        now = timezone.now()
+        self.assertEqual(valuation.calculate_value(self.hall, as_of=now), valuation.calculate_value(self.hall))
+        with self.assertNumQueries(1):
+            valuation.calculate_value(self.hall, as_of=self.before)
+
+    def test_annotate_value_as_of(self):
+        other = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+        MaterialsAmount.objects.create(project=other, material=self.steel, amount=1)
+        halls = valuation.annotate_value(Hall.objects.order_by('project_id'), as_of=self.before)
+        self.assertEqual(
+            [valuation.quantize(hall.value) for hall in halls],
+            [valuation.calculate_value(hall, as_of=self.before) for hall in [self.hall, other]],
+        )
+        self.assertEqual(
+            [valuation.quantize(hall.value) for hall in valuation.annotate_value(Hall.objects.order_by('project_id'))],
+            [valuation.calculate_value(self.hall), valuation.calculate_value(other)],
+        )
+
+    def test_import_records_history(self):
+        imports.import_prices(['material,price', 'steel,30.00', 'bolts,1.00', 'paint,4.00'])
+        self.assertEqual(
+            [price for price, _ in self.history(self.steel)],
+            [Decimal('10.00'), Decimal('20.00'), Decimal('30.00')],
+        )
+        self.assertEqual(len(self.history(self.bolts)), 1)
+        paint = MaterialsPrices.objects.get(material='paint')
+        self.assertEqual(self.history(paint), [(Decimal('4.00'), None)])
+
+    def test_quote_as_of(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('halls-quote'), {
+            'variants': [{'length': 10, 'width': 10, 'pole_height': 5, 'roof_slope': 7}],
+            'materials': [{'material': self.steel.pk, 'amount': 10}],
+            'as_of': self.before.isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(response.data[0]['calculated_value']), 10 * 10 * valuation.BASE_RATE + 100)
+
+    def test_admin_read_only(self):
+        admin = User.objects.create_superuser(username='admin', email='admin@test.com', password='admin')
+        self.client.force_login(admin)
+        entry = MaterialPriceHistory.objects.filter(material=self.steel).first()
+        self.assertEqual(self.client.get(reverse('admin:api_materialpricehistory_changelist')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('admin:api_materialpricehistory_add')).status_code, 403)
+        self.client.post(reverse('admin:api_materialpricehistory_change', args=[entry.pk]), {'price': '1.00'})
+        self.client.post(reverse('admin:api_materialpricehistory_delete', args=[entry.pk]), {'post': 'yes'})
+        entry.refresh_from_db()
+        self.assertEqual(entry.price, Decimal('10.00'))
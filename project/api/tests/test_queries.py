@@ -0,0 +1,58 @@
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from api.models import Hall, MaterialsPrices, MaterialsAmount, User
+from api.tests.helpers import ConstantQueriesMixin
+
+
+class TestListQueries(ConstantQueriesMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.steel = MaterialsPrices.objects.create(material='steel', price=10)
+        self.hall = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+
+    def add_halls(self, count):
+        for _ in range(count):
+            Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+
+    def add_amounts(self, count):
+        for _ in range(count):
+            hall = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+            MaterialsAmount.objects.create(project=hall, material=self.steel, amount=1)
+
+    def add_prices(self, count):
+        for _ in range(count):
+            MaterialsPrices.objects.create(material=f'material {MaterialsPrices.objects.count()}', price=1)
+
+    def test_halls_list(self):
+        self.client.force_authenticate(self.user)
+        self.hall.delete()
+        self.assertConstantQueries(reverse('halls-list'), self.add_halls)
+
+    def test_halls_list_cursor(self):
+        self.client.force_authenticate(self.user)
+        self.hall.delete()
+        self.assertConstantQueries(reverse('halls-list'), self.add_halls, params={'pagination': 'cursor'})
+
+    def test_amounts_list(self):
+        self.client.force_authenticate(self.user)
+        self.assertConstantQueries(reverse('amounts-list'), self.add_amounts)
+
+    def test_prices_list(self):
+        self.client.force_authenticate(self.user)
+        self.steel.delete()
+        self.assertConstantQueries(reverse('prices-list'), self.add_prices)
+
+    def test_admin_hall_changelist(self):
+        self.client.force_login(self.user)
+        self.hall.delete()
+        self.assertConstantQueries(reverse('admin:api_hall_changelist'), self.add_halls, size_param=None)
+
+    def test_admin_amount_changelist(self):
+        self.client.force_login(self.user)
+        self.assertConstantQueries(
+            reverse('admin:api_materialsamount_changelist'), self.add_amounts, size_param=None
+        )
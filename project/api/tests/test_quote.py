@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from api.models import Hall, MaterialsPrices, MaterialsAmount, User
+from api import valuation
+from api.prices import price_cache
+
+
+class TestQuote(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.client.force_authenticate(self.user)
+        self.steel = MaterialsPrices.objects.create(material='steel', price=Decimal('19.99'))
+        self.bolts = MaterialsPrices.objects.create(material='bolts', price=Decimal('0.35'))
+        self.materials = [
+            {'material': self.steel.pk, 'amount': 120},
+            {'material': self.bolts.pk, 'amount': 1500},
+        ]
+
+    def quote(self, data):
+        return self.client.post(reverse('halls-quote'), data, format='json')
+
+    def test_matches_saved_hall_value(self):
+        response = self.quote({
+            'variants': [{'length': '12.50', 'width': '7.30', 'pole_height': 5, 'roof_slope': 7}],
+            'materials': self.materials,
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        hall = Hall.objects.create(salesman=self.user, length=Decimal('12.50'), width=Decimal('7.30'),
+                                   pole_height=5, roof_slope=7)
+        for line in self.materials:
+            MaterialsAmount.objects.create(project=hall, material_id=line['material'], amount=line['amount'])
+        self.assertEqual(response.data, [{
+            'length': '12.50',
+            'width': '7.30',
+            'pole_height': '5.00',
+            'roof_slope': 7,
+            'calculated_value': str(valuation.calculate_value(hall)),
+        }])
+
+    def test_grid(self):
+        response = self.quote({
+            'grid': {'length': [10, 20], 'width': [5, 6, 7], 'pole_height': [4], 'roof_slope': [5, 10]},
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 12)
+        self.assertEqual(
+            (response.data[0]['length'], response.data[0]['width'], response.data[0]['roof_slope']),
+            ('10.00', '5.00', 5),
+        )
+        self.assertEqual(response.data[1]['roof_slope'], 10)
+        self.assertEqual(response.data[-1]['calculated_value'], str(valuation.base_value(20, 7)))
+
+    def test_no_database_writes(self):
+        price_cache.prices()
+        variants = [
+            {'length': length, 'width': 8, 'pole_height': 5, 'roof_slope': 7} for length in range(10, 410)
+        ]
+        # Only the price table stamp.
+        with self.assertNumQueries(1):
+            response = self.quote({'variants': variants, 'materials': self.materials})
+        self.assertEqual(len(response.data), 400)
+        self.assertFalse(Hall.objects.exists())
+
+    def test_invalid(self):
+        for data in [
+            {},
+            {'variants': [], 'grid': {'length': [1], 'width': [1], 'pole_height': [1], 'roof_slope': [1]}},
+            {'variants': [{'length': 'x', 'width': 1, 'pole_height': 1, 'roof_slope': 1}]},
+            {'grid': {'length': [1], 'width': [1], 'pole_height': [1], 'roof_slope': []}},
+            {'grid': {'length': [1] * 100, 'width': [1] * 100, 'pole_height': [1], 'roof_slope': [1]}},
+            {'variants': [{'length': 1, 'width': 1, 'pole_height': 1, 'roof_slope': 1}],
+             'materials': [{'material': 999, 'amount': 1}]},
+            {'variants': [{'length': 1, 'width': 1, 'pole_height': 1, 'roof_slope': 1}]
+             * (settings.HALL_QUOTE_MAX_VARIANTS + 1)},
+        ]:
+            with self.subTest(data=str(data)[:80]):
+                self.assertEqual(self.quote(data).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from api.models import Hall, MaterialsPrices, MaterialsAmount, User
+from api.readers import amount_reader, hall_reader
+from api.serializers import HallSerializer, MaterialsAmountSerializer
+
+
+class TestReaders(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.client.force_authenticate(self.user)
+        self.steel = MaterialsPrices.objects.create(material='steel', price=Decimal('19.99'))
+        self.hall = Hall.objects.create(
+            salesman=self.user,
+            length=Decimal('12.5'),
+            width=Decimal('7.30'),
+            pole_height=5,
+            roof_slope=7,
+        )
+        MaterialsAmount.objects.create(project=self.hall, material=self.steel, amount=120)
+        self.orphan = Hall.objects.create(length=3, width=3, pole_height=3, roof_slope=3)
+        Hall.objects.filter(pk=self.orphan.pk).update(calculated_value=None)
+        MaterialsAmount.objects.create(project=self.orphan, material=None, amount=-4)
+
+    def assertSameAsSerializer(self, reader, serializer_class, queryset):
+        expected = serializer_class(queryset, many=True).data
+        self.assertEqual(reader.rows(reader.values(queryset)), expected)
+        self.assertEqual([reader.from_instance(instance) for instance in queryset], expected)
+
+    def test_hall_reader_matches_serializer(self):
+        self.assertSameAsSerializer(hall_reader, HallSerializer, Hall.objects.order_by('project_id'))
+
+    def test_amount_reader_matches_serializer(self):
+        self.assertSameAsSerializer(
+            amount_reader, MaterialsAmountSerializer, MaterialsAmount.objects.order_by('amount_id')
+        )
+
+    def test_hall_views(self):
+        response = self.client.get(reverse('halls-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.hall.refresh_from_db()
+        self.assertEqual(response.data['results'], HallSerializer([self.hall], many=True).data)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('halls-detail', args=[self.hall.pk]))
+        self.assertEqual(response.data, HallSerializer(self.hall).data)
+
+    def test_amount_views(self):
+        response = self.client.get(reverse('amounts-list'), {'pagination': 'cursor'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        expected = MaterialsAmountSerializer(MaterialsAmount.objects.order_by('amount_id'), many=True).data
+        self.assertEqual(response.data['results'], expected)
@@ -0,0 +1,128 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from api.models import Hall, MaterialsPrices, MaterialsAmount, User
+from api import response_cache
+
+
+class TestResponseCache(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.other = User.objects.create_user(
+            username='other',
+            email='other@test.com',
+            password='test'
+        )
+        self.client.force_authenticate(self.user)
+        self.steel = MaterialsPrices.objects.create(material='steel', price=10)
+        self.hall = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+        MaterialsAmount.objects.create(project=self.hall, material=self.steel, amount=3)
+
+    def assertServedFromCache(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(1):
+            # Only the conditional GET validators are read.
+            second = self.client.get(url)
+        self.assertEqual(second.data, first.data)
+        return first.data
+
+    def hall_values(self):
+        return [hall['calculated_value'] for hall in self.client.get(reverse('halls-list')).data['results']]
+
+    def test_hall_list_cached(self):
+        self.assertServedFromCache(reverse('halls-list'))
+
+    def test_hall_list_cached_per_query(self):
+        data = self.assertServedFromCache(reverse('halls-list'))
+        self.assertEqual(self.client.get(reverse('halls-list'), {'search': 'nothing'}).data['count'], 0)
+        self.assertEqual(self.client.get(reverse('halls-list')).data, data)
+
+    def test_hall_list_cached_per_user(self):
+        self.assertServedFromCache(reverse('halls-list'))
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(reverse('halls-list')).data['count'], 0)
+
+    def test_amount_change_invalidates(self):
+        before = self.hall_values()
+        line = MaterialsAmount.objects.get(project=self.hall)
+        line.amount = 4
+        line.save()
+        self.assertNotEqual(self.hall_values(), before)
+
+    def test_invalidated_again_on_commit(self):
+        scopes = [response_cache.halls_scope(self.user.pk)]
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                line = MaterialsAmount.objects.get(project=self.hall)
+                line.amount = 4
+                line.save()
+                # What a concurrent list request would have cached its pre-commit rows under.
+                inside = response_cache.generations(scopes)
+        self.assertNotEqual(response_cache.generations(scopes), inside)
+
+    def test_write_missed_by_generations_refreshes(self):
+        self.hall_values()
+        # Another process, whose generations live in its own local memory cache.
+        Hall.objects.filter(pk=self.hall.pk).update(calculated_value=Decimal('1.00'), updated_at=timezone.now())
+        response = self.client.get(reverse('halls-list'))
+        self.assertEqual(response.data['results'][0]['calculated_value'], '1.00')
+        self.assertEqual(self.client.get(reverse('halls-list'), HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                         status.HTTP_304_NOT_MODIFIED)
+
+    def test_recalculate_command_invalidates(self):
+        before = response_cache.generations([response_cache.HALLS])
+        call_command('recalculate_halls', stdout=StringIO())
+        self.assertNotEqual(response_cache.generations([response_cache.HALLS]), before)
+
+    def test_price_change_invalidates(self):
+        before = self.hall_values()
+        self.steel.price = 12
+        self.steel.save()
+        self.assertNotEqual(self.hall_values(), before)
+        self.assertEqual(self.client.get(reverse('prices-list')).data['results'][0]['price'], '12.00')
+
+    def test_price_delete_invalidates(self):
+        before = self.hall_values()
+        self.steel.delete()
+        self.assertNotEqual(self.hall_values(), before)
+
+    def test_hall_delete_invalidates(self):
+        self.hall_values()
+        self.hall.delete()
+        self.assertEqual(self.hall_values(), [])
+
+    def test_bill_of_materials_invalidates(self):
+        before = self.hall_values()
+        response = self.client.put(f'/api/amounts/bom/{self.hall.project_id}', [
+            {'material': self.steel.material_id, 'amount': 8},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(self.hall_values(), before)
+
+    def test_bulk_invalidates(self):
+        self.hall_values()
+        response = self.client.post('/api/halls/bulk', [
+            {'length': Decimal('4.00'), 'width': 4, 'pole_height': 5, 'roof_slope': 7},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(self.hall_values()), 2)
+
+    def test_salesman_rename_invalidates(self):
+        self.hall_values()
+        self.user.email = 'renamed@test.com'
+        self.user.save()
+        response = self.client.get(reverse('halls-list'))
+        self.assertEqual(response.data['results'][0]['salesman'], 'renamed@test.com')
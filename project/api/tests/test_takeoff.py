@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from api.models import Hall, User
+from api import takeoff
+
+
+class TestTakeoff(APITestCase):
+    def setUp(self):
+        takeoff.cache_clear()
+        self.user = User.objects.create_user(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_flat_roof(self):
+        result = takeoff.takeoff(30, 12, 5, 0)
+        self.assertEqual((result.frames, result.frame_spacing), (6, Decimal('6.00')))
+        self.assertEqual(
+            (result.columns, result.column_section, result.column_length),
+            (12, 'HEA 200', Decimal('60.00')),
+        )
+        self.assertEqual(
+            (result.rafters, result.rafter_section, result.rafter_length),
+            (12, 'IPE 240', Decimal('72.00')),
+        )
+        # 6 m half span at 1.5 m spacing - 5 purlin rows per side.
+        self.assertEqual((result.purlins, result.purlin_length), (10, Decimal('300.00')))
+        self.assertEqual(result.roof_area, Decimal('360.00'))
+        self.assertEqual(result.wall_area, Decimal('420.00'))
+        self.assertEqual(result.steel_weight, Decimal('4748.40'))
+
+    def test_slope_adds_rafter_roof_and_gables(self):
+        flat = takeoff.takeoff(30, 12, 5, 0)
+        pitched = takeoff.takeoff(30, 12, 5, 15)
+        self.assertEqual(pitched.roof_area, Decimal('372.70'))
+        self.assertEqual(pitched.wall_area, Decimal('439.29'))
+        self.assertGreater(pitched.rafter_length, flat.rafter_length)
+
+    def test_sections_follow_span_and_height(self):
+        self.assertEqual(takeoff.takeoff(30, 20, 7, 10).rafter_section, 'IPE 360')
+        self.assertEqual(takeoff.takeoff(30, 20, 7, 10).column_section, 'HEA 240')
+        # Beyond the tables the largest section is used.
+        self.assertEqual(takeoff.takeoff(30, 60, 20, 10).rafter_section, 'IPE 550')
+
+    def test_memoized_per_geometry(self):
+        first = takeoff.takeoff(Decimal('30.00'), 12, 5, 7)
+        self.assertIs(takeoff.takeoff(30, Decimal('12.0'), '5', 7), first)
+        self.assertEqual(takeoff.cache_info().hits, 1)
+
+    def test_hall_takeoff_endpoint(self):
+        hall = Hall.objects.create(salesman=self.user, length=30, width=12, pole_height=5, roof_slope=0)
+        response = self.client.get(reverse('halls-takeoff', args=[hall.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, takeoff.takeoff(30, 12, 5, 0).as_dict())
+        self.assertEqual(response.data['roof_area'], '360.00')
+
+    def test_quote_with_takeoff(self):
+        response = self.client.post(reverse('halls-quote'), {
+            'grid': {'length': [30, 36], 'width': [12], 'pole_height': [5], 'roof_slope': [0]},
+            'takeoff': True,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['takeoff']['frames'], 6)
+        self.assertEqual(response.data[1]['takeoff']['frames'], 7)
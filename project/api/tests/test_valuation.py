@@ -0,0 +1,455 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APITestCase
+from rest_framework import status
+from api.models import Hall, MaterialsPrices, MaterialsAmount, PriceTableVersion, User
+from api import valuation
+from api.prices import price_cache
+
+
+class APITestValuationHelper(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='test',
+            email='test@test.com',
+            password='test'
+        )
+        self.hall = Hall.objects.create(
+            salesman=self.user,
+            length=Decimal('12.50'),
+            width=Decimal('7.30'),
+            pole_height=5,
+            roof_slope=7,
+        )
+        self.steel = MaterialsPrices.objects.create(material='steel', price=Decimal('19.99'))
+        self.bolts = MaterialsPrices.objects.create(material='bolts', price=Decimal('0.35'))
+        MaterialsAmount.objects.create(project=self.hall, material=self.steel, amount=120)
+        MaterialsAmount.objects.create(project=self.hall, material=self.bolts, amount=1500)
+
+    def loop_value(self, hall):
+        """
+        Reference implementation - the original per-row loop.
+        """
+        value = float(hall.length) * float(hall.width) * 833.33
+        for material in MaterialsAmount.objects.filter(project=hall.project_id, material__isnull=False):
+            value += float(material.amount) * float(material.material.price)
+        return Decimal(value).quantize(Decimal('0.01'))
+
+
+class TestValuation(APITestValuationHelper):
+
+    def test_calculate_value_matches_loop(self):
+        self.assertEqual(valuation.calculate_value(self.hall), self.loop_value(self.hall))
+
+    def test_calculate_value_without_materials(self):
+        hall = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+        self.assertEqual(valuation.calculate_value(hall), Decimal('20833.25'))
+
+    def test_calculate_value_skips_deleted_material(self):
+        expected = valuation.calculate_value(self.hall) - 1500 * Decimal('0.35')
+        self.bolts.delete()
+        self.assertEqual(valuation.calculate_value(self.hall), expected)
+
+    def test_calculate_value_single_query(self):
+        valuation.calculate_value(self.hall)
+        # The price table stamp and the lines.
+        with self.assertNumQueries(2):
+            valuation.calculate_value(self.hall)
+
+    def test_price_change_reloads_price_table(self):
+        price_cache.prices()
+        self.steel.price = Decimal('30.00')
+        self.steel.save()
+        self.assertEqual(price_cache.prices()[self.steel.material_id], Decimal('30.00'))
+        self.assertEqual(valuation.calculate_value(self.hall), self.loop_value(self.hall))
+
+    def test_stamp_written_elsewhere_reloads_price_table(self):
+        price_cache.prices()
+        # Another process writing the prices - nothing reaches this one but the stamp.
+        MaterialsPrices.objects.filter(pk=self.steel.pk).update(price=Decimal('30.00'))
+        PriceTableVersion.objects.update(stamp='elsewhere')
+        self.assertEqual(price_cache.prices()[self.steel.material_id], Decimal('30.00'))
+
+    def test_prices_list_from_cache(self):
+        self.client.force_authenticate(self.user)
+        self.client.get('/api/prices')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/prices')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['results'][0], {
+            'material_id': self.steel.material_id,
+            'material': 'steel',
+            'price': '19.99',
+            'update_date': self.steel.update_date.isoformat(),
+        })
+        response = self.client.get('/api/prices', {'material': 'bolts'})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_calculate_endpoint(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(f'/api/halls/{self.hall.project_id}/calculate')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Decimal(response.data['calculated_value']), self.loop_value(self.hall))
+
+
+class TestCalculateMemo(APITestValuationHelper):
+
+    def calculate(self):
+        hall = Hall.objects.get(pk=self.hall.pk)
+        return valuation.calculate_stored_value(hall), hall
+
+    def test_unchanged_hall_not_written(self):
+        written, hall = self.calculate()
+        self.assertTrue(written)
+        self.assertEqual(hall.calculated_value, self.loop_value(self.hall))
+        price_cache.prices()
+        hall = Hall.objects.get(pk=self.hall.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(valuation.calculate_stored_value(hall))
+        self.assertFalse([query for query in queries if query['sql'].startswith('UPDATE')])
+
+    def test_amount_change_recalculates(self):
+        self.calculate()
+        line = MaterialsAmount.objects.get(project=self.hall, material=self.steel)
+        line.amount = 10
+        line.save()
+        written, hall = self.calculate()
+        self.assertTrue(written)
+        self.assertEqual(hall.calculated_value, self.loop_value(self.hall))
+
+    def test_price_change_recalculates(self):
+        self.calculate()
+        # Bypasses the incremental update - only the memo can notice the new price.
+        MaterialsPrices.objects.filter(pk=self.steel.pk).update(price=Decimal('25.00'))
+        price_cache.invalidate()
+        written, hall = self.calculate()
+        self.assertTrue(written)
+        self.assertEqual(hall.calculated_value, self.loop_value(self.hall))
+
+    def test_unused_price_change_keeps_memo(self):
+        self.calculate()
+        MaterialsPrices.objects.create(material='paint', price=Decimal('4.00'))
+        self.assertFalse(self.calculate()[0])
+
+    def test_value_written_elsewhere_recalculates(self):
+        self.calculate()
+        Hall.objects.filter(pk=self.hall.pk).update(calculated_value=Decimal('1.00'))
+        written, hall = self.calculate()
+        self.assertTrue(written)
+        self.assertEqual(hall.calculated_value, self.loop_value(self.hall))
+
+    def test_calculate_endpoint_invalidates_list(self):
+        self.client.force_authenticate(self.user)
+        Hall.objects.filter(pk=self.hall.pk).update(calculated_value=Decimal('1.00'))
+        self.client.get('/api/halls')
+        self.client.get(f'/api/halls/{self.hall.project_id}/calculate')
+        response = self.client.get('/api/halls')
+        self.assertEqual(Decimal(response.data['results'][0]['calculated_value']), self.loop_value(self.hall))
+
+
+class TestHallValues(APITestValuationHelper):
+
+    def setUp(self):
+        super().setUp()
+        self.other = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+        MaterialsAmount.objects.create(project=self.other, material=self.steel, amount=3)
+        stranger = User.objects.create_user(username='other', email='other@test.com', password='other')
+        self.foreign = Hall.objects.create(salesman=stranger, length=5, width=5, pole_height=5, roof_slope=7)
+        # Stored values are stale - the endpoint computes fresh ones.
+        Hall.objects.update(calculated_value=Decimal('1.00'))
+        self.client.force_authenticate(self.user)
+
+    def test_values_of_selected_halls(self):
+        ids = f'{self.hall.pk},{self.other.pk},{self.foreign.pk}'
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/halls/values', {'project_id': ids})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'project_id': self.other.pk, 'calculated_value': '20893.22'},
+            {'project_id': self.hall.pk, 'calculated_value': str(self.loop_value(self.hall))},
+        ])
+        self.assertEqual(Hall.objects.get(pk=self.hall.pk).calculated_value, Decimal('1.00'))
+
+    def test_values_with_filter(self):
+        Hall.objects.filter(pk=self.other.pk).update(roof_slope=20)
+        response = self.client.get('/api/halls/values', {'roof_slope_min': 10})
+        self.assertEqual([row['project_id'] for row in response.data], [self.other.pk])
+
+    def test_values_limit(self):
+        with self.settings(HALL_VALUES_MAX_HALLS=1):
+            response = self.client.get('/api/halls/values')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_values_as_of(self):
+        response = self.client.get('/api/halls/values', {'as_of': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/halls/values', {'project_id': self.other.pk, 'as_of': '1971-01-01T00:00:00Z'})
+        self.assertEqual(response.data, [{'project_id': self.other.pk, 'calculated_value': '20833.25'}])
+
+
+class TestRecalculate(APITestValuationHelper):
+
+    def test_recalculate_halls(self):
+        other = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+        updated = valuation.recalculate_halls(batch_size=1)
+        self.assertEqual(updated, 2)
+        self.hall.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.hall.calculated_value, self.loop_value(self.hall))
+        self.assertEqual(other.calculated_value, Decimal('20833.25'))
+
+    def test_recalculate_halls_by_material(self):
+        other = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+        Hall.objects.filter(pk=other.pk).update(calculated_value=None)
+        updated = valuation.recalculate_halls(materials=[self.steel.material_id])
+        self.assertEqual(updated, 1)
+        other.refresh_from_db()
+        self.assertIsNone(other.calculated_value)
+
+    def test_recalculate_command(self):
+        out = StringIO()
+        call_command('recalculate_halls', '--batch-size', '10', stdout=out)
+        self.assertIn('Recalculated 1 halls.', out.getvalue())
+
+    def test_recalculate_endpoint_requires_admin(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/halls/recalculate')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_recalculate_endpoint(self):
+        admin = User.objects.create_superuser(username='admin', email='admin@admin.com', password='admin123')
+        self.client.force_authenticate(admin)
+        response = self.client.post('/api/halls/recalculate', {'batch_size': 50}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 1)
+        self.hall.refresh_from_db()
+        self.assertEqual(self.hall.calculated_value, self.loop_value(self.hall))
+
+
+    def test_recalculate_endpoint_materials_must_be_list(self):
+        admin = User.objects.create_superuser(username='admin', email='admin@admin.com', password='admin123')
+        self.client.force_authenticate(admin)
+        for materials in [str(self.steel.pk), self.steel.pk, [True], ['x']]:
+            response = self.client.post('/api/halls/recalculate', {'materials': materials}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, materials)
+        response = self.client.post('/api/halls/recalculate', {'materials': [self.steel.pk]})
+        self.assertEqual(response.data['updated'], 1)
+
+
+class TestIncrementalValue(APITestValuationHelper):
+
+    def assertFresh(self, hall):
+        hall.refresh_from_db()
+        self.assertEqual(hall.calculated_value, valuation.calculate_value(hall))
+
+    def test_new_hall_gets_base_value(self):
+        hall = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+        self.assertEqual(hall.calculated_value, Decimal('20833.25'))
+
+    def test_amount_changes(self):
+        self.assertFresh(self.hall)
+        paint = MaterialsPrices.objects.create(material='paint', price=Decimal('45.10'))
+        roofing = MaterialsPrices.objects.create(material='roofing', price=Decimal('12.00'))
+        line = MaterialsAmount.objects.create(project=self.hall, material=paint, amount=3)
+        self.assertFresh(self.hall)
+        line.amount = 10
+        line.material = roofing
+        line.save()
+        self.assertFresh(self.hall)
+        line.delete()
+        self.assertFresh(self.hall)
+
+    def test_amount_moved_to_other_hall(self):
+        other = Hall.objects.create(salesman=self.user, length=5, width=5, pole_height=5, roof_slope=7)
+        line = MaterialsAmount.objects.filter(project=self.hall).first()
+        line.project = other
+        line.save()
+        self.assertFresh(self.hall)
+        self.assertFresh(other)
+
+    def test_price_changes(self):
+        self.steel.price = Decimal('21.45')
+        self.steel.save()
+        self.assertFresh(self.hall)
+        self.bolts.delete()
+        self.assertFresh(self.hall)
+
+    def test_hall_dimensions_change(self):
+        self.hall.length = Decimal('20.00')
+        self.hall.save()
+        self.assertFresh(self.hall)
+
+    def test_stale_instance_keeps_deltas(self):
+        stale = Hall.objects.get(pk=self.hall.pk)
+        self.steel.price = Decimal('30.00')
+        self.steel.save()
+        stale.roof_slope = 9
+        stale.save()
+        self.assertFresh(self.hall)
+
+    def test_unvalued_hall_is_recalculated(self):
+        Hall.objects.filter(pk=self.hall.pk).update(calculated_value=None)
+        paint = MaterialsPrices.objects.create(material='paint', price=Decimal('45.10'))
+        MaterialsAmount.objects.create(project=self.hall, material=paint, amount=3)
+        self.assertFresh(self.hall)
+
+    def test_amount_endpoint_updates_value(self):
+        self.client.force_authenticate(self.user)
+        line = MaterialsAmount.objects.filter(project=self.hall).first()
+        response = self.client.patch(f'/api/amounts/{line.amount_id}', {'amount': 7}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFresh(self.hall)
+
+    def test_duplicate_line_rejected(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/amounts', {
+            'project': self.hall.project_id,
+            'material': self.steel.material_id,
+            'amount': 1,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestBulkCreate(APITestValuationHelper):
+
+    def test_bulk_create(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/halls/bulk', [
+            {'length': 5, 'width': 5, 'pole_height': 5, 'roof_slope': 7},
+            {'length': 10, 'width': 4, 'pole_height': 6, 'roof_slope': 12, 'materials': [
+                {'material': self.steel.material_id, 'amount': 10},
+                {'material': self.bolts.material_id, 'amount': 200},
+            ]},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['status'] for item in response.data], ['created', 'created'])
+        for item in response.data:
+            hall = Hall.objects.get(pk=item['project_id'])
+            self.assertEqual(hall.salesman, self.user)
+            self.assertEqual(hall.calculated_value, valuation.calculate_value(hall))
+        self.assertEqual(MaterialsAmount.objects.filter(project=response.data[1]['project_id']).count(), 2)
+
+    def test_bulk_upsert_replaces_lines(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/halls/bulk', [
+            {'project_id': self.hall.project_id, 'length': 20, 'width': 10, 'pole_height': 6, 'roof_slope': 12,
+             'materials': [{'material': self.bolts.material_id, 'amount': 10}]},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data[0]['status'], 'updated')
+        self.hall.refresh_from_db()
+        self.assertEqual(self.hall.length, 20)
+        self.assertEqual(list(MaterialsAmount.objects.filter(project=self.hall).values_list('amount', flat=True)), [10])
+        self.assertEqual(self.hall.calculated_value, valuation.calculate_value(self.hall))
+
+    def test_bulk_reports_item_errors(self):
+        other = User.objects.create_user(username='other', email='other@test.com', password='test')
+        foreign = Hall.objects.create(salesman=other, length=5, width=5, pole_height=5, roof_slope=7)
+        self.client.force_authenticate(self.user)
+        halls_before = Hall.objects.count()
+        response = self.client.post('/api/halls/bulk', [
+            {'length': 5, 'width': 5, 'pole_height': 5, 'roof_slope': 7},
+            {'length': 5, 'width': 5, 'pole_height': 5},
+            {'length': 5, 'width': 5, 'pole_height': 5, 'roof_slope': 7, 'materials': [{'material': 999, 'amount': 1}]},
+            {'project_id': foreign.project_id, 'length': 5, 'width': 5, 'pole_height': 5, 'roof_slope': 7},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data[0]['status'], 'created')
+        self.assertIn('roof_slope', response.data[1]['errors'])
+        self.assertIn('materials', response.data[2]['errors'])
+        self.assertIn('project_id', response.data[3]['errors'])
+        self.assertEqual(Hall.objects.count(), halls_before + 1)
+
+    def test_bulk_rejects_repeated_project(self):
+        self.client.force_authenticate(self.user)
+        item = {
+            'project_id': self.hall.project_id, 'length': 5, 'width': 5, 'pole_height': 5, 'roof_slope': 7,
+            'materials': [{'material': self.steel.material_id, 'amount': 2}],
+        }
+        response = self.client.post('/api/halls/bulk', [item, item], format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data[0]['status'], 'updated')
+        self.assertIn('project_id', response.data[1]['errors'])
+        self.assertEqual(MaterialsAmount.objects.filter(project=self.hall).count(), 1)
+
+    def test_bulk_requires_list(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/halls/bulk', {'length': 5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestBillOfMaterials(APITestValuationHelper):
+
+    def setUp(self):
+        super().setUp()
+        self.paint = MaterialsPrices.objects.create(material='paint', price=Decimal('45.10'))
+        self.client.force_authenticate(self.user)
+
+    def test_put_replaces_lines(self):
+        response = self.client.put(f'/api/amounts/bom/{self.hall.project_id}', [
+            {'material': self.steel.material_id, 'amount': 120},
+            {'material': self.paint.material_id, 'amount': 4},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['deleted']), (1, 0, 1))
+        self.assertEqual(
+            dict(MaterialsAmount.objects.filter(project=self.hall).values_list('material', 'amount')),
+            {self.steel.material_id: 120, self.paint.material_id: 4},
+        )
+        self.hall.refresh_from_db()
+        self.assertEqual(self.hall.calculated_value, valuation.calculate_value(self.hall))
+        self.assertEqual(Decimal(response.data['calculated_value']), self.hall.calculated_value)
+
+    def test_patch_keeps_other_lines(self):
+        response = self.client.patch(f'/api/amounts/bom/{self.hall.project_id}', [
+            {'material': self.steel.material_id, 'amount': 5},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['deleted']), (0, 1, 0))
+        self.assertEqual(MaterialsAmount.objects.filter(project=self.hall).count(), 2)
+        self.hall.refresh_from_db()
+        self.assertEqual(self.hall.calculated_value, valuation.calculate_value(self.hall))
+
+    def test_constant_queries(self):
+        extra = [MaterialsPrices.objects.create(material=f'extra {number}', price=1) for number in range(4)]
+        price_cache.prices()
+        with CaptureQueriesContext(connection) as few:
+            self.client.put(f'/api/amounts/bom/{self.hall.project_id}', [
+                {'material': self.steel.material_id, 'amount': 1},
+                {'material': self.paint.material_id, 'amount': 1},
+            ], format='json')
+        for material in extra[:2]:
+            MaterialsAmount.objects.create(project=self.hall, material=material, amount=1)
+        MaterialsAmount.objects.create(project=self.hall, material=self.bolts, amount=1)
+        with CaptureQueriesContext(connection) as more:
+            self.client.put(f'/api/amounts/bom/{self.hall.project_id}', [
+                {'material': self.steel.material_id, 'amount': 2},
+                {'material': self.bolts.material_id, 'amount': 2},
+                {'material': extra[2].material_id, 'amount': 1},
+                {'material': extra[3].material_id, 'amount': 1},
+            ], format='json')
+        self.assertEqual(len(few), len(more))
+
+    def test_rejects_duplicates_and_unknown_materials(self):
+        response = self.client.put(f'/api/amounts/bom/{self.hall.project_id}', [
+            {'material': self.steel.material_id, 'amount': 1},
+            {'material': self.steel.material_id, 'amount': 2},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.put(f'/api/amounts/bom/{self.hall.project_id}', [
+            {'material': 999, 'amount': 1},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_foreign_project(self):
+        other = User.objects.create_user(username='other', email='other@test.com', password='test')
+        self.client.force_authenticate(other)
+        response = self.client.put(f'/api/amounts/bom/{self.hall.project_id}', [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
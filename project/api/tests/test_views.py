@@ -98,3 +98,56 @@ class TestHallViewSet(APITestHallHelper):
             'pole_height': 10,
         })
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_page_size_param(self):
+        self.authenticate()
+        for _ in range(3):
+            self.create_hall()
+        response = self.client.get(reverse('halls-list'), {'page': 2, 'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_cursor_pagination(self):
+        self.authenticate()
+        created = [self.create_hall().data['project_id'] for _ in range(5)]
+        self.assertEqual(self.walk_cursor({}), sorted(created, reverse=True))
+
+    def test_cursor_pagination_ignores_ordering(self):
+        self.authenticate()
+        # Equal calculated values - a cursor on them would skip or repeat halls.
+        created = [self.create_hall().data['project_id'] for _ in range(5)]
+        self.assertEqual(self.walk_cursor({'ordering': 'calculated_value'}), sorted(created, reverse=True))
+
+    def walk_cursor(self, params):
+        response = self.client.get(reverse('halls-list'), {'pagination': 'cursor', 'page_size': 2, **params})
+        seen = []
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen += [hall['project_id'] for hall in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        return seen
+
+    def test_search_by_project_id_and_salesman(self):
+        self.authenticate()
+        first = self.create_hall().data['project_id']
+        self.create_hall()
+        response = self.client.get(reverse('halls-list'), {'search': first})
+        self.assertEqual([hall['project_id'] for hall in response.data['results']], [first])
+        response = self.client.get(reverse('halls-list'), {'search': 'test'})
+        self.assertEqual(response.data['count'], 2)
+        response = self.client.get(reverse('halls-list'), {'search': 'nobody'})
+        self.assertEqual(response.data['count'], 0)
+
+    def test_numeric_range_filters(self):
+        self.authenticate()
+        self.create_hall()
+        small = self.create_hall().data['project_id']
+        self.client.put(f"/api/halls/{small}", {'length': 1, 'width': 1, 'pole_height': 5, 'roof_slope': 20})
+        response = self.client.get(reverse('halls-list'), {'calculated_value_max': 1000})
+        self.assertEqual([hall['project_id'] for hall in response.data['results']], [small])
+        response = self.client.get(reverse('halls-list'), {'roof_slope_min': 10, 'roof_slope_max': 30})
+        self.assertEqual([hall['project_id'] for hall in response.data['results']], [small])
@@ -0,0 +1,50 @@
+"""
+Issuing and reading of JWT tokens.
+Access tokens authenticate API calls, refresh tokens only buy new access tokens (see RefreshView)
+so clients do not send credentials - and the server does not run the password hasher - each day.
+"""
+from datetime import datetime
+
+from django.conf import settings
+
+import jwt
+
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+
+def encode(payload, token_type):
+    lifetime = settings.JWT_AUTH['ACCESS_TOKEN_LIFETIME' if token_type == ACCESS else 'REFRESH_TOKEN_LIFETIME']
+    payload = dict(payload, type=token_type, exp=datetime.utcnow() + lifetime)
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+
+
+def decode(token, token_type=ACCESS):
+    """
+    Raises jwt.ExpiredSignatureError / jwt.DecodeError for bad tokens.
+    Tokens issued before token types existed count as access tokens.
+    """
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms='HS256')
+    if payload.get('type', ACCESS) != token_type:
+        raise jwt.DecodeError('Wrong token type.')
+    return payload
+
+
+def access_token(user):
+    return encode(
+        {
+            'user_id': user.pk,
+            'username': user.username,
+            'email': user.email,
+            'is_staff': user.is_staff,
+            'is_superuser': user.is_superuser,
+            'is_active': user.is_active,
+            'ver': user.token_version,
+        },
+        ACCESS,
+    )
+
+
+def refresh_token(user):
+    return encode({'user_id': user.pk, 'ver': user.token_version}, REFRESH)
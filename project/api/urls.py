@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework import routers
-from .views import RegisterView, LoginView, MaterialsPricesViewSet, MaterialsAmountViewSet, HallViewSet, UserViewSet
+from . import async_views
+from .views import RegisterView, LoginView, RefreshView, MaterialsPricesViewSet, MaterialsAmountViewSet, HallViewSet, UserViewSet, \
+    ValuationJobViewSet
 
 
 router = routers.DefaultRouter(trailing_slash=False)
@@ -8,10 +10,17 @@ router.register(r'users', UserViewSet, basename='users')
 router.register(r'halls', HallViewSet, basename='halls')
 router.register(r'prices', MaterialsPricesViewSet, basename='prices')
 router.register(r'amounts', MaterialsAmountViewSet, basename='amounts')
+router.register(r'jobs', ValuationJobViewSet, basename='jobs')
 
 
 urlpatterns = [
     path('', include(router.urls)),
     path('login/', LoginView.as_view(), name='login'),
+    path('login/refresh/', RefreshView.as_view(), name='refresh'),
     path('register/', RegisterView.as_view(), name='register'),
+    # Async-native read endpoints for ASGI deployments.
+    path('async/halls', async_views.hall_list, name='async-halls-list'),
+    path('async/halls/<int:pk>', async_views.hall_detail, name='async-halls-detail'),
+    path('async/halls/<int:pk>/calculate', async_views.hall_calculate, name='async-halls-calculate'),
+    path('async/prices', async_views.price_list, name='async-prices-list'),
 ]
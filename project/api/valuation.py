@@ -0,0 +1,247 @@
+import hashlib
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import price_history, response_cache
+from .models import Hall, MaterialsAmount
+from .prices import price_cache
+
+
+BASE_RATE = Decimal('833.33')
+CENTS = Decimal('0.01')
+
+VALUE_FIELD = DecimalField(max_digits=10, decimal_places=2)
+
+
+def quantize(value):
+    return Decimal(value).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def base_value(length, width):
+    """
+    Value of the bare hall structure - depends only on its floor area.
+    """
+    return quantize(Decimal(length) * Decimal(width) * BASE_RATE)
+
+
+def materials_value_expression(prefix='materialsamount__', price=None):
+    """
+    SUM(amount * price) over the material lines reachable through `prefix`.
+    `price` is the price column, the current price of the line's material by default.
+    Lines with a deleted material (NULL price) do not count.
+    """
+    price = price or f'{prefix}material__price'
+    return Coalesce(
+        Sum(
+            ExpressionWrapper(F(f'{prefix}amount') * F(price), output_field=VALUE_FIELD),
+            output_field=VALUE_FIELD,
+        ),
+        Value(Decimal('0')),
+        output_field=VALUE_FIELD,
+    )
+
+
+def hall_value_expression(price=None):
+    """
+    Full hall value: length * width * BASE_RATE plus all material lines.
+    """
+    return ExpressionWrapper(
+        F('length') * F('width') * Value(BASE_RATE, output_field=VALUE_FIELD) + materials_value_expression(price=price),
+        output_field=VALUE_FIELD,
+    )
+
+
+def annotate_value(queryset, as_of=None):
+    """
+    Annotates every hall of the queryset with `value`, grouped in one query.
+    With `as_of` the lines are priced at the prices in force then, joined from the price history.
+    """
+    if as_of is None:
+        return queryset.annotate(value=hall_value_expression())
+    return queryset.annotate(
+        price_as_of=price_history.price_as_of('materialsamount__material__history', as_of),
+    ).annotate(value=hall_value_expression(price='price_as_of__price'))
+
+
+def calculate_value(hall, as_of=None):
+    """
+    Value of a single hall - its (material, amount) lines priced from the cached price table,
+    or with `as_of` at the prices in force then (one query joining the price history).
+    """
+    lines = MaterialsAmount.objects.filter(project=hall.pk)
+    if as_of is None:
+        lines = lines.values_list('material_id', 'amount')
+        return value_from_prices(hall.length, hall.width, lines, price_cache.prices())
+    rows = list(lines.annotate(price_as_of=price_history.price_as_of('material__history', as_of)).values_list(
+        'material_id', 'amount', 'price_as_of__price',
+    ))
+    lines = [(material_id, amount) for material_id, amount, _ in rows]
+    return value_from_prices(hall.length, hall.width, lines, {material_id: price for material_id, _, price in rows})
+
+
+def recalculate_halls(queryset=None, materials=None, batch_size=500):
+    """
+    Recomputes calculated_value of many halls at once.
+    Values come from one grouped aggregate query read in chunks and are written back with bulk_update.
+    When `materials` is given only halls using at least one of them are recalculated.
+    Returns the number of updated halls.
+    """
+    if queryset is None:
+        queryset = Hall.objects.all()
+    if materials is not None:
+        queryset = queryset.filter(
+            project_id__in=MaterialsAmount.objects.filter(material__in=materials).values('project')
+        )
+    halls = annotate_value(queryset.only('project_id', 'calculated_value', 'updated_at')).order_by('project_id')
+
+    updated = 0
+    batch = []
+    for hall in halls.iterator(chunk_size=batch_size):
+        hall.calculated_value = quantize(hall.value)
+        hall.updated_at = timezone.now()
+        batch.append(hall)
+        if len(batch) >= batch_size:
+            updated += _write_values(batch)
+            batch = []
+    if batch:
+        updated += _write_values(batch)
+    return updated
+
+
+def fingerprint(hall, lines, prices):
+    """
+    Digest of what the value of `hall` depends on - its floor size, the (material, amount) lines with their
+    current prices - together with the calculated_value it holds. Any other path that changes the value
+    (deltas, recalculations, bulk writes) therefore breaks the match as well.
+    """
+    parts = [str(hall.length), str(hall.width), str(hall.calculated_value)]
+    parts += sorted(f'{material_id}:{amount}:{prices.get(material_id)}' for material_id, amount in lines)
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def calculate_stored_value(hall):
+    """
+    Calculates and stores the value of `hall` for the calculate endpoints.
+    When the inputs and the stored value match the fingerprint of the last calculation nothing is computed
+    or written. Otherwise only the value, its fingerprint and the update stamps are updated - no save()
+    and no signals. Returns True when the hall was written.
+    """
+    lines = list(MaterialsAmount.objects.filter(project=hall.pk).values_list('material_id', 'amount'))
+    prices = price_cache.prices()
+    if hall.calculated_value is not None and hall.value_fingerprint == fingerprint(hall, lines, prices):
+        return False
+    _store_value(hall, value_from_prices(hall.length, hall.width, lines, prices), lines, prices)
+    Hall.objects.filter(pk=hall.pk).update(
+        calculated_value=hall.calculated_value,
+        value_fingerprint=hall.value_fingerprint,
+        update_date=hall.update_date,
+        updated_at=hall.updated_at,
+    )
+    response_cache.invalidate_halls([hall.salesman_id])
+    return True
+
+
+async def acalculate_stored_value(hall):
+    """
+    calculate_stored_value() on the async ORM.
+    """
+    lines = [
+        line async for line in MaterialsAmount.objects.filter(project=hall.pk).values_list('material_id', 'amount')
+    ]
+    prices = await price_cache.aprices()
+    if hall.calculated_value is not None and hall.value_fingerprint == fingerprint(hall, lines, prices):
+        return False
+    _store_value(hall, value_from_prices(hall.length, hall.width, lines, prices), lines, prices)
+    await Hall.objects.filter(pk=hall.pk).aupdate(
+        calculated_value=hall.calculated_value,
+        value_fingerprint=hall.value_fingerprint,
+        update_date=hall.update_date,
+        updated_at=hall.updated_at,
+    )
+    await response_cache.ainvalidate_halls([hall.salesman_id])
+    return True
+
+
+def _store_value(hall, value, lines, prices):
+    hall.calculated_value = value
+    hall.value_fingerprint = fingerprint(hall, lines, prices)
+    hall.updated_at = timezone.now()
+    hall.update_date = timezone.localdate(hall.updated_at)
+
+
+def _write_values(halls):
+    Hall.objects.bulk_update(halls, ['calculated_value', 'updated_at'])
+    return len(halls)
+
+
+def value_from_prices(length, width, lines, prices):
+    """
+    Hall value computed in Python from (material_id, amount) pairs and a {material_id: price} snapshot.
+    """
+    value = Decimal(length) * Decimal(width) * BASE_RATE
+    for material_id, amount in lines:
+        value += line_value(amount, prices.get(material_id))
+    return quantize(value)
+
+
+def quote_values(dimensions, lines, prices):
+    """
+    Values of unsaved hall variants sharing one bill of materials - [(length, width), ...] in, values out.
+    The materials part does not depend on the dimensions, so it is priced once; repeated floor sizes once.
+    """
+    materials = sum((line_value(amount, prices.get(material_id)) for material_id, amount in lines), Decimal('0'))
+    values = {}
+    for length, width in dimensions:
+        if (length, width) not in values:
+            values[length, width] = quantize(Decimal(length) * Decimal(width) * BASE_RATE + materials)
+    return [values[length, width] for length, width in dimensions]
+
+
+def line_value(amount, price):
+    """
+    Value of one material line - a line without material (deleted price) is worth nothing.
+    """
+    if amount is None or price is None:
+        return Decimal('0')
+    return Decimal(amount) * Decimal(price)
+
+
+def apply_delta(project_id, delta):
+    """
+    Shifts calculated_value of one hall by `delta` in a single UPDATE.
+    A hall that was never valued is recalculated in full instead.
+    """
+    if not delta:
+        return
+    updated = Hall.objects.filter(pk=project_id, calculated_value__isnull=False).update(
+        calculated_value=F('calculated_value') + Value(delta, output_field=VALUE_FIELD),
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        recalculate_halls(Hall.objects.filter(pk=project_id))
+
+
+def apply_price_delta(material_id, delta):
+    """
+    Shifts calculated_value of every valued hall using the material by SUM(amount) * `delta`.
+    """
+    if not delta:
+        return
+    amounts = MaterialsAmount.objects.filter(
+        project=OuterRef('pk'),
+        material=material_id,
+    ).values('project').annotate(total=Sum('amount')).values('total')
+    halls = Hall.objects.filter(
+        project_id__in=MaterialsAmount.objects.filter(material=material_id).values('project'),
+        calculated_value__isnull=False,
+    )
+    halls.update(
+        calculated_value=F('calculated_value') + ExpressionWrapper(
+            Subquery(amounts) * Value(delta, output_field=VALUE_FIELD),
+            output_field=VALUE_FIELD,
+        ),
+        updated_at=timezone.now(),
+    )
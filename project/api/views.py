@@ -1,18 +1,37 @@
-from rest_framework import viewsets, filters, status
+from rest_framework import viewsets, filters, serializers, status
 from rest_framework.response import Response
 from rest_framework.generics import GenericAPIView
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.decorators import action
 from rest_framework import mixins
+from rest_framework.reverse import reverse
 
+from django.conf import settings
 from django.contrib.auth import authenticate
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django_filters.rest_framework import DjangoFilterBackend
 
-from .jwt import JWTAuthentication
-from .models import Hall, MaterialsPrices, MaterialsAmount, User
+import codecs
+
+import jwt
+
+from . import exports, imports, jobs, price_history, response_cache, signals, takeoff, tokens, valuation
+from .conditional import ConditionalGetMixin, make_etag
+from .filters import HallFilter
+from .jwt import JWTAuthentication, DatabaseJWTAuthentication
+from .models import Hall, MaterialsPrices, MaterialsAmount, User, ValuationJob
+from .prices import price_cache
+from .readers import ValuesReadMixin, amount_reader, hall_reader, hall_value_reader, quote_reader
+from .response_cache import CachedListMixin
+from .search import HallSearchFilter
 from .serializers import UserSerializer, HallSerializer, MaterialsPricesSerializer, MaterialsAmountSerializer, \
-    ChangePasswordSerializer, LoginRegisterSerializer
+    ChangePasswordSerializer, LoginRegisterSerializer, RefreshTokenSerializer, HallBulkSerializer, \
+    MaterialLineSerializer, ValuationJobSerializer, HallQuoteSerializer
 
 
 class LoginView(GenericAPIView):
@@ -33,6 +52,24 @@ class LoginView(GenericAPIView):
         return Response({'message': 'Invalid credentials.'}, status=status.HTTP_401_UNAUTHORIZED)
 
 
+class RefreshView(GenericAPIView):
+    """
+    Refresh view - exchanges refresh token for a new pair of tokens, no credentials needed.
+    """
+    serializer_class = RefreshTokenSerializer
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            payload = tokens.decode(serializer.validated_data['refresh_token'], tokens.REFRESH)
+            user = User.objects.get(pk=payload['user_id'], token_version=payload['ver'], is_active=True)
+        except (jwt.InvalidTokenError, KeyError, User.DoesNotExist):
+            return Response({'message': 'Invalid refresh token.'}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(LoginRegisterSerializer(user).data, status=status.HTTP_200_OK)
+
+
 class RegisterView(GenericAPIView):
     """
     Register view - also provides first auth token, ready to use.
@@ -62,7 +99,7 @@ class UserViewSet(mixins.RetrieveModelMixin,
     User views with various permissions and querysets - depends on method.
     """
     queryset = User.objects.all().order_by('-date_joined')
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [DatabaseJWTAuthentication]
 
     def get_serializer_class(self):
         if self.action in ['update']:
@@ -102,106 +139,391 @@ class UserViewSet(mixins.RetrieveModelMixin,
 
 class HallSetPagination(PageNumberPagination):
     page_size = 10
-    page_size_query_param = 'page'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that always walks its own `ordering` - `?ordering=` could name a non-unique or
+    nullable column, and the cursor would then skip or repeat rows. The parameter is ignored here.
+    """
+    def get_ordering(self, request, queryset, view):
+        return (self.ordering,) if isinstance(self.ordering, str) else tuple(self.ordering)
+
+
+class HallCursorPagination(KeysetPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-project_id'
+
+
+class MaterialsAmountCursorPagination(KeysetPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
     max_page_size = 100
+    ordering = 'amount_id'
 
 
-class HallViewSet(viewsets.ModelViewSet):
+class CursorPaginationMixin:
+    """
+    `?pagination=cursor` switches list to keyset pagination - constant cost per page, no COUNT(*).
+    """
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.pagination_class
+            if self.request is not None and self.request.query_params.get('pagination') == 'cursor':
+                pagination_class = self.cursor_pagination_class
+            self._paginator = pagination_class() if pagination_class else None
+        return self._paginator
+
+
+class HallViewSet(ConditionalGetMixin, CachedListMixin, ValuesReadMixin, CursorPaginationMixin, viewsets.ModelViewSet):
     """
     Halls views.
     create() method calculates base value of the steel hall.
+    List supports `?pagination=cursor` for keyset pagination on project_id.
+    List and retrieve answer conditional requests (ETag, Last-Modified for retrieve) with 304
+    and are built from `.values()` rows by hall_reader (see readers.py).
     """
     queryset = Hall.objects.all()
     serializer_class = HallSerializer
+    values_reader = hall_reader
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['project_id', '@salesman', 'calculated_value', 'roof_slope']
+    filter_backends = [DjangoFilterBackend, HallSearchFilter, filters.OrderingFilter]
+    filterset_class = HallFilter
     ordering = ['-project_id']
     pagination_class = HallSetPagination
+    cursor_pagination_class = HallCursorPagination
 
     def get_queryset(self):
-        return Hall.objects.filter(salesman=self.request.user)
+        return Hall.objects.filter(salesman=self.request.user).select_related('salesman')
 
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = HallSerializer(instance)
-        return Response(serializer.data)
+    def list_cache_scopes(self, request):
+        return [response_cache.HALLS, response_cache.halls_scope(request.user.pk)]
+
+    def get_permissions(self):
+        if self.action in ['recalculate']:
+            permission_classes = [IsAdminUser]
+        else:
+            permission_classes = self.permission_classes
+        return [permission() for permission in permission_classes]
 
     def create(self, request, *args, **kwargs):
         serializer = HallSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            hall = Hall.objects.create(
-                salesman=self.request.user,
-                length=request.data['length'],
-                width=request.data['width'],
-                pole_height=request.data['pole_height'],
-                roof_slope=request.data['roof_slope'],
-            )
-            serializer = HallSerializer(hall, many=False)
+            serializer.save(salesman=self.request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def update(self, request, *args, **kwargs):
-        serializer = HallSerializer(data=request.data, context={'request': request})
+        hall = self.get_object()
+        serializer = HallSerializer(hall, data=request.data, context={'request': request})
         if serializer.is_valid():
-            hall = self.get_object()
-            hall.length = request.data['length']
-            hall.width = request.data['width']
-            hall.pole_height = request.data['pole_height']
-            hall.roof_slope = request.data['roof_slope']
-            hall.save()
-            serializer = HallSerializer(hall, many=False)
+            serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['POST'])
+    def bulk(self, request):
+        """
+        Creates (or with `project_id` replaces) many halls with their material lines in one transaction.
+        Invalid halls are reported per item and do not stop the valid ones.
+        """
+        items = request.data if isinstance(request.data, list) else []
+        project_ids = [
+            item['project_id'] for item in items
+            if isinstance(item, dict) and isinstance(item.get('project_id'), int)
+        ]
+        context = {
+            'request': request,
+            'prices': price_cache.prices(),
+            'owned': set(self.get_queryset().filter(project_id__in=project_ids).values_list('project_id', flat=True)),
+        }
+        serializer = HallBulkSerializer(data=request.data, many=True, context=context)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        halls = serializer.save()
+        response_cache.invalidate_halls([request.user.pk])
+        results = []
+        for hall, errors, item in zip(halls, serializer.item_errors, serializer.validated_data):
+            if errors:
+                results.append({'errors': errors})
+            else:
+                results.append({
+                    'project_id': hall.project_id,
+                    'status': 'updated' if item.get('project_id') else 'created',
+                    'calculated_value': hall.calculated_value,
+                })
+        if not any(serializer.item_errors):
+            response_status = status.HTTP_201_CREATED
+        elif any(not errors for errors in serializer.item_errors):
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(results, status=response_status)
+
+    @action(detail=True, methods=['GET'], url_path='takeoff', url_name='takeoff')
+    def structural_takeoff(self, request, pk=None):
+        """
+        Structural quantities derived from the hall geometry - see takeoff.py.
+        """
+        hall = self.get_object()
+        return Response(takeoff.takeoff(hall.length, hall.width, hall.pole_height, hall.roof_slope).as_dict())
+
+    @action(detail=False, methods=['POST'])
+    def quote(self, request):
+        """
+        Values unsaved dimension variants against one price snapshot - nothing is written.
+        Body: `variants` (list of length/width/pole_height/roof_slope) or `grid` (lists of values per
+        dimension, every combination quoted), optional `materials` ({material, amount} lines),
+        `takeoff` (true adds the structural takeoff of every variant) and `as_of` (price the materials
+        at the prices in force then - materials without a price then count nothing).
+        """
+        prices = price_cache.prices()
+        serializer = HallQuoteSerializer(data=request.data, context={'request': request, 'prices': prices})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        variants = serializer.get_variants()
+        lines = [(line['material'], line['amount']) for line in serializer.validated_data.get('materials', [])]
+        if 'as_of' in serializer.validated_data:
+            prices = price_history.prices_as_of(serializer.validated_data['as_of'], [line[0] for line in lines])
+        values = valuation.quote_values([(variant['length'], variant['width']) for variant in variants], lines, prices)
+        results = quote_reader.rows(dict(variant, calculated_value=value) for variant, value in zip(variants, values))
+        if serializer.validated_data.get('takeoff'):
+            for result, variant in zip(results, variants):
+                result['takeoff'] = takeoff.takeoff(**variant).as_dict()
+        return Response(results)
+
+    @action(detail=False, methods=['GET'], url_path='values', url_name='values')
+    def portfolio_values(self, request):
+        """
+        Fresh values of many own halls from one grouped aggregate - nothing is written.
+        Select halls with `?project_id=1,2,3` and / or the list filters and search; `?as_of=` prices
+        them at the prices in force then. At most HALL_VALUES_MAX_HALLS halls per request.
+        """
+        as_of = None
+        if 'as_of' in request.query_params:
+            try:
+                as_of = serializers.DateTimeField().run_validation(request.query_params['as_of'])
+            except serializers.ValidationError as exc:
+                return Response({'as_of': exc.detail}, status=status.HTTP_400_BAD_REQUEST)
+        halls = valuation.annotate_value(self.filter_queryset(self.get_queryset()), as_of=as_of)
+        limit = settings.HALL_VALUES_MAX_HALLS
+        rows = list(halls.values_list('project_id', 'value')[:limit + 1])
+        if len(rows) > limit:
+            return Response(
+                {'message': f'More than {limit} halls selected - narrow the filter.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(hall_value_reader.rows(
+            {'project_id': project_id, 'calculated_value': valuation.quantize(value)} for project_id, value in rows
+        ))
+
+    @action(detail=False, methods=['GET'])
+    def export(self, request):
+        """
+        Streams all own halls (list filters apply) with their material lines.
+        `?export_format=csv` (default, one row per line) or `ndjson` (one hall per line).
+        """
+        export_format = request.query_params.get('export_format', exports.CSV)
+        if export_format not in exports.FORMATS:
+            return Response({'message': 'Unknown export_format.'}, status=status.HTTP_400_BAD_REQUEST)
+        halls = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            exports.rows(halls, export_format),
+            content_type=exports.FORMATS[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="halls.{export_format}"'
+        return response
+
     def destroy(self, request, *args, **kwargs):
         hall = self.get_object()
         hall.delete()
         return Response(data='Project deleted.', status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['GET'])
-    def calculate(self):
+    def calculate(self, request, pk=None):
         """
-        Business logic here.
+        Business logic here - see valuation.calculate_stored_value(); an unchanged hall is not written again.
+        With VALUATION_JOBS['ENABLED'] the calculation is queued instead - 202 with the job to poll.
         """
         hall = self.get_object()
-        materials = MaterialsAmount.objects.filter(project=hall.project_id)
-        value = float(hall.length) * float(hall.width) * 833.33
-        for material in materials:
-            value += float(material.amount) * float(material.material.price)
-        hall.calculated_value = value
-        hall.save()
+        if settings.VALUATION_JOBS['ENABLED']:
+            return self.job_response(request, jobs.enqueue_calculation(hall, request.user))
+        valuation.calculate_stored_value(hall)
         serializer = HallSerializer(hall, many=False)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['POST'])
+    def recalculate(self, request):
+        """
+        Recalculates all halls (of every salesman) - e.g. after a price change.
+        Optional `materials` (a list of ids) limits it to halls using those materials,
+        `batch_size` sets bulk_update chunks.
+        """
+        if hasattr(request.data, 'getlist') and 'materials' in request.data:
+            # Form data repeats the key for every id.
+            materials = request.data.getlist('materials')
+        else:
+            materials = request.data.get('materials', None)
+        batch_size = request.data.get('batch_size', settings.HALL_RECALCULATE_BATCH_SIZE)
+        try:
+            batch_size = int(batch_size)
+            if batch_size < 1:
+                raise ValueError
+            if materials is not None:
+                # A string is iterable too - '12' must not become [1, 2].
+                if not isinstance(materials, list) or any(isinstance(material, bool) for material in materials):
+                    raise ValueError
+                materials = [int(material) for material in materials]
+        except (TypeError, ValueError):
+            return Response({'message': 'Invalid materials or batch_size.'}, status=status.HTTP_400_BAD_REQUEST)
+        if settings.VALUATION_JOBS['ENABLED']:
+            return self.job_response(request, jobs.enqueue_recalculation(materials, batch_size, request.user))
+        updated = valuation.recalculate_halls(materials=materials, batch_size=batch_size)
+        response_cache.invalidate(response_cache.HALLS)
+        return Response({'updated': updated}, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def job_response(request, job):
+        location = reverse('jobs-detail', args=[job.job_id], request=request)
+        return Response(
+            ValuationJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': location},
+        )
 
-class MaterialsPricesViewSet(viewsets.ModelViewSet):
+
+class MaterialsPricesViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     """
     Basic views of materials with prices.
+    Unfiltered list is served from the price cache.
+    Admins can upsert whole price lists from CSV through `import`.
     """
-    queryset = MaterialsPrices.objects.all()
+    queryset = MaterialsPrices.objects.all().order_by('material_id')
     serializer_class = MaterialsPricesSerializer
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     filterset_fields = ['material', 'price']
 
+    def filter_queryset(self, queryset):
+        if self.action == 'list' and not any(field in self.request.query_params for field in self.filterset_fields):
+            return list(price_cache.rows().values())
+        return super().filter_queryset(queryset)
 
-class MaterialsAmountViewSet(viewsets.ModelViewSet):
+    def get_permissions(self):
+        if self.action in ['import_csv']:
+            permission_classes = [IsAdminUser]
+        else:
+            permission_classes = self.permission_classes
+        return [permission() for permission in permission_classes]
+
+    def list_cache_scopes(self, request):
+        return [response_cache.PRICES]
+
+    @action(detail=False, methods=['POST'], url_path='import')
+    def import_csv(self, request):
+        """
+        Upserts prices by material name from an uploaded CSV `file` with `material,price` columns.
+        Halls using changed prices are recalculated once, after the import - with VALUATION_JOBS['ENABLED']
+        by a queued job, whose id is returned as `job`.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'message': 'Upload a CSV file as `file`.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = imports.import_prices(codecs.iterdecode(upload, 'utf-8-sig'), user=request.user)
+        except (ValueError, UnicodeDecodeError) as exc:
+            return Response({'message': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict(), status=status.HTTP_200_OK)
+
+    def list_validators(self, request):
+        # Every price change replaces the table stamp - no need to look at the table.
+        return make_etag(request, price_cache.version())
+
+
+class MaterialsAmountViewSet(ConditionalGetMixin, ValuesReadMixin, CursorPaginationMixin, viewsets.ModelViewSet):
     """
     Basic views of material amount for particular project.
     User can search materials for project by query param.
+    Also supports `?pagination=cursor`. List and retrieve go through amount_reader.
     """
     queryset = MaterialsAmount.objects.all()
     serializer_class = MaterialsAmountSerializer
+    values_reader = amount_reader
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     filterset_fields = ['project', 'material']
+    cursor_pagination_class = MaterialsAmountCursorPagination
+
+    @action(detail=False, methods=['PUT', 'PATCH'], url_path=r'bom/(?P<project_id>[0-9]+)')
+    def bom(self, request, project_id=None):
+        """
+        Writes the whole bill of materials of an own project at once - a list of {material, amount}.
+        PUT replaces it (lines not listed are deleted), PATCH only adds and changes lines.
+        """
+        hall = get_object_or_404(Hall, pk=project_id, salesman=request.user)
+        context = {'request': request, 'prices': price_cache.prices()}
+        serializer = MaterialLineSerializer(data=request.data, many=True, context=context)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        submitted = {line['material']: line['amount'] for line in serializer.validated_data}
+        lines = list(MaterialsAmount.objects.filter(project=hall))
+        existing = {line.material_id: line for line in lines if line.material_id is not None}
+
+        to_create = [
+            MaterialsAmount(project=hall, material_id=material, amount=amount)
+            for material, amount in submitted.items() if material not in existing
+        ]
+        to_update = []
+        for material, amount in submitted.items():
+            line = existing.get(material)
+            if line is not None and line.amount != amount:
+                line.amount = amount
+                line.update_date = timezone.localdate()
+                line.updated_at = timezone.now()
+                to_update.append(line)
+        to_delete = []
+        if request.method == 'PUT':
+            to_delete = [line.pk for line in lines if line.material_id not in submitted]
+
+        with transaction.atomic(), signals.valuation_muted():
+            MaterialsAmount.objects.bulk_create(to_create)
+            MaterialsAmount.objects.bulk_update(to_update, ['amount', 'update_date', 'updated_at'])
+            MaterialsAmount.objects.filter(pk__in=to_delete).delete()
+            valuation.recalculate_halls(Hall.objects.filter(pk=hall.pk))
+        response_cache.invalidate_halls([request.user.pk])
+        hall.refresh_from_db(fields=['calculated_value'])
+        return Response({
+            'created': len(to_create),
+            'updated': len(to_update),
+            'deleted': len(to_delete),
+            'calculated_value': hall.calculated_value,
+        }, status=status.HTTP_200_OK)
 
     def get_queryset(self):
         project_id = self.request.query_params.get('project_id', None)
         if project_id:
-            halls = MaterialsAmount.objects.filter(project=project_id)
+            halls = MaterialsAmount.objects.filter(project=project_id).order_by('amount_id')
             return halls
-        halls = MaterialsAmount.objects.all()
+        halls = MaterialsAmount.objects.all().order_by('amount_id')
         return halls
+
+
+class ValuationJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Queued valuation jobs of the user - poll a job until its status is done or failed.
+    """
+    serializer_class = ValuationJobSerializer
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    filterset_fields = ['status', 'kind', 'hall']
+
+    def get_queryset(self):
+        return ValuationJob.objects.filter(requested_by=self.request.user).order_by('-job_id')
@@ -0,0 +1,190 @@
+"""
+WSGI vs ASGI load test.
+
+Runs the same authenticated GETs against
+  wsgi        - the DRF views through core.wsgi, one thread per concurrent client
+  asgi-sync   - the DRF views through core.asgi (every request hops to a thread via sync_to_async)
+  asgi-async  - the async views of api/async_views.py through core.asgi, one task per concurrent client
+and reports requests per second and latency percentiles. The applications are called in-process, so
+every mode runs on the same hardware without server overhead; each mode gets its own process.
+Needs a reachable database configured through the usual DB_* variables - it creates a `benchmark`
+user there if missing (add halls / prices to make the pages realistic).
+
+    python benchmarks/asgi.py --requests 2000 --concurrency 32 --endpoint halls
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = {
+    'halls': ('/api/halls', '/api/async/halls'),
+    'prices': ('/api/prices', '/api/async/prices'),
+}
+MODES = ['wsgi', 'asgi-sync', 'asgi-async']
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_wsgi(url, token, requests, concurrency):
+    from core.wsgi import application
+
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(count):
+        own = []
+        for _ in range(count):
+            statuses = []
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'SCRIPT_NAME': '',
+                'PATH_INFO': url,
+                'QUERY_STRING': '',
+                'SERVER_NAME': 'localhost',
+                'SERVER_PORT': '80',
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'localhost',
+                'HTTP_AUTHORIZATION': f'Bearer {token}',
+                'wsgi.version': (1, 0),
+                'wsgi.url_scheme': 'http',
+                'wsgi.input': io.BytesIO(),
+                'wsgi.errors': sys.stderr,
+                'wsgi.multithread': True,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            start = time.perf_counter()
+            response = application(environ, lambda status, headers: statuses.append(status))
+            b''.join(response)
+            response.close()
+            own.append(time.perf_counter() - start)
+            assert statuses[-1].startswith('200'), statuses[-1]
+        with lock:
+            latencies.extend(own)
+
+    workers = [threading.Thread(target=worker, args=(requests // concurrency,)) for _ in range(concurrency)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies
+
+
+def run_asgi(url, token, requests, concurrency):
+    from core.asgi import application
+
+    async def call():
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url,
+            'raw_path': url.encode(),
+            'root_path': '',
+            'query_string': b'',
+            'headers': [(b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': ('localhost', 80),
+        }
+        sent = []
+        body_read = False
+
+        async def receive():
+            nonlocal body_read
+            if not body_read:
+                body_read = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # The client never disconnects - Django cancels this wait once the response is sent.
+            await asyncio.Future()
+
+        async def send(message):
+            sent.append(message)
+
+        await application(scope, receive, send)
+        assert sent[0]['status'] == 200, sent[0]
+
+    async def worker(count, latencies):
+        for _ in range(count):
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    async def main():
+        latencies = []
+        await asyncio.gather(*[worker(requests // concurrency, latencies) for _ in range(concurrency)])
+        return latencies
+
+    return asyncio.run(main())
+
+
+def run_mode(mode, endpoint, requests, concurrency):
+    """
+    Runs in the child process.
+    """
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+    from api.models import User
+
+    user = User.objects.filter(email='benchmark@example.com').first()
+    if user is None:
+        user = User.objects.create_user(username='benchmark', email='benchmark@example.com', password='benchmark')
+    token = user.token
+    sync_url, async_url = ENDPOINTS[endpoint]
+
+    started = time.perf_counter()
+    if mode == 'wsgi':
+        latencies = run_wsgi(sync_url, token, requests, concurrency)
+    else:
+        latencies = run_asgi(async_url if mode == 'asgi-async' else sync_url, token, requests, concurrency)
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='halls')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(args.child, args.endpoint, args.requests, args.concurrency)
+        return
+
+    print(f"{'mode':<12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', mode, '--requests', str(args.requests),
+             '--concurrency', str(args.concurrency), '--endpoint', args.endpoint],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<12}{result['requests_per_second']:>10.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Connection reuse benchmark.
+
+Runs the same authenticated API calls once for every DB_CONNECTION_MODE (see core/settings.py)
+and reports requests per second, database connections opened per second and latency percentiles.
+Connections are counted by the server (pg_stat_database.sessions, PostgreSQL 14+), so checkouts
+from the pool are not mistaken for new connections. Every mode runs in its own process so settings
+are read fresh. Needs a reachable database configured through the usual DB_* variables - it creates
+a `benchmark` user there if missing.
+
+    python benchmarks/connections.py --requests 2000 --threads 8 --modes none persistent pool
+
+GET /api/prices (50 prices), 2000 requests from 8 threads, PostgreSQL 16 on the same single-core host:
+
+    mode             req/s    conn/s    p50 ms    p99 ms
+    none              96.4      96.4     79.64    157.41
+    persistent       294.1       1.2     24.17     81.74
+    pool             311.9       0.9     22.35     81.82
+
+The handshake here is local and unencrypted - over TLS or to a remote server it costs more.
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def server_sessions():
+    """
+    Connections the server has accepted for this database so far.
+    """
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_stat_clear_snapshot()')
+        cursor.execute('SELECT sessions FROM pg_stat_database WHERE datname = current_database()')
+        return cursor.fetchone()[0]
+
+
+def run_mode(requests, threads, url):
+    """
+    Runs in the child process - Django is configured with the mode from the environment.
+    """
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+    from api.models import User
+    from core.wsgi import application
+
+    user = User.objects.filter(email='benchmark@example.com').first()
+    if user is None:
+        user = User.objects.create_user(username='benchmark', email='benchmark@example.com', password='benchmark')
+    token = user.token
+
+    latencies = []
+    lock = threading.Lock()
+
+    def call(statuses):
+        # Straight through the WSGI handler - unlike the test client it opens and closes
+        # connections per request exactly like a deployed worker.
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'PATH_INFO': url,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost',
+            'HTTP_AUTHORIZATION': f'Bearer {token}',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        response = application(environ, lambda status, headers: statuses.append(status))
+        b''.join(response)
+        response.close()
+
+    def worker(count):
+        own = []
+        statuses = []
+        for _ in range(count):
+            start = time.perf_counter()
+            call(statuses)
+            own.append(time.perf_counter() - start)
+            assert statuses[-1].startswith('200'), statuses[-1]
+        with lock:
+            latencies.extend(own)
+
+    sessions = server_sessions()
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(requests // threads,)) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    # Backends report their statistics with a delay.
+    time.sleep(2)
+    opened = server_sessions() - sessions
+
+    print(json.dumps({
+        'requests_per_second': len(latencies) / elapsed,
+        'connections_per_second': opened / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--url', default='/api/prices')
+    parser.add_argument('--modes', nargs='+', default=['none', 'persistent'])
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(args.requests, args.threads, args.url)
+        return
+
+    print(f"{'mode':<12}{'req/s':>10}{'conn/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', '--requests', str(args.requests),
+             '--threads', str(args.threads), '--url', args.url],
+            env=dict(os.environ, DB_CONNECTION_MODE=mode),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{mode:<12}{result['requests_per_second']:>10.1f}{result['connections_per_second']:>10.1f}"
+            f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Serialization micro-benchmark.
+
+Compares HallSerializer / MaterialsAmountSerializer (many=True) on model instances with the lean
+readers of api/readers.py on the equivalent `.values()` rows. Rows are built in memory, so only
+the per-row CPU cost is measured - no database is needed.
+
+    python benchmarks/serializers.py --rows 100 --repeat 200
+"""
+import argparse
+import datetime
+import os
+import sys
+import timeit
+from decimal import Decimal
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100, help='rows per page')
+    parser.add_argument('--repeat', type=int, default=200, help='pages serialized per measurement')
+    args = parser.parse_args()
+
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    import django
+    django.setup()
+
+    from api.models import Hall, MaterialsAmount, User
+    from api.readers import amount_reader, hall_reader
+    from api.serializers import HallSerializer, MaterialsAmountSerializer
+
+    salesman = User(id=1, username='benchmark', email='benchmark@example.com')
+    today = datetime.date.today()
+    halls = [
+        Hall(
+            project_id=number,
+            salesman=salesman,
+            length=Decimal('12.50'),
+            width=Decimal('7.30'),
+            pole_height=Decimal('5.00'),
+            roof_slope=7,
+            update_date=today,
+            calculated_value=Decimal('78440.16'),
+        )
+        for number in range(args.rows)
+    ]
+    hall_rows = [
+        {
+            'project_id': hall.project_id,
+            'salesman__email': salesman.email,
+            'length': hall.length,
+            'width': hall.width,
+            'pole_height': hall.pole_height,
+            'roof_slope': hall.roof_slope,
+            'update_date': hall.update_date,
+            'calculated_value': hall.calculated_value,
+        }
+        for hall in halls
+    ]
+    amounts = [
+        MaterialsAmount(amount_id=number, project_id=1, material_id=number, amount=120, update_date=today)
+        for number in range(args.rows)
+    ]
+    amount_rows = [
+        {'amount_id': amount.amount_id, 'project_id': 1, 'material_id': amount.material_id,
+         'amount': amount.amount, 'update_date': today}
+        for amount in amounts
+    ]
+    assert HallSerializer(halls, many=True).data == hall_reader.rows(hall_rows)
+    assert MaterialsAmountSerializer(amounts, many=True).data == amount_reader.rows(amount_rows)
+
+    cases = [
+        ('halls', lambda: HallSerializer(halls, many=True).data, lambda: hall_reader.rows(hall_rows)),
+        ('amounts', lambda: MaterialsAmountSerializer(amounts, many=True).data, lambda: amount_reader.rows(amount_rows)),
+    ]
+    print(f"{'endpoint':<12}{'serializer ms':>15}{'reader ms':>12}{'speedup':>10}")
+    for name, serializer, reader in cases:
+        serializer_ms = min(timeit.repeat(serializer, number=args.repeat, repeat=3)) / args.repeat * 1000
+        reader_ms = min(timeit.repeat(reader, number=args.repeat, repeat=3)) / args.repeat * 1000
+        print(f'{name:<12}{serializer_ms:>15.3f}{reader_ms:>12.3f}{serializer_ms / reader_ms:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/dev/ref/settings/
 """
 
 import os
+from datetime import timedelta
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'django_filters',
     'api',
@@ -90,6 +92,34 @@ DATABASES = {
     }
 }
 
+# Connection reuse, selected by DB_CONNECTION_MODE:
+# 'none'       - new connection for every request (Django default)
+# 'persistent' - connection kept by each worker thread for DB_CONN_MAX_AGE seconds, checked before reuse
+# 'pool'       - psycopg 3 connection pool shared by the process (needs `psycopg[pool]` installed)
+# 'pgbouncer'  - connections through an external PgBouncer in transaction pooling mode
+# benchmarks/connections.py compares them.
+
+DB_CONNECTION_MODE = os.environ.get('DB_CONNECTION_MODE', 'none')
+
+if DB_CONNECTION_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+elif DB_CONNECTION_MODE == 'pool':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+elif DB_CONNECTION_MODE == 'pgbouncer':
+    # Server side cursors do not survive transaction pooling. Keeping the connection to PgBouncer is cheap.
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+elif DB_CONNECTION_MODE != 'none':
+    raise ValueError(f'Unknown DB_CONNECTION_MODE: {DB_CONNECTION_MODE}')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/dev/ref/settings/#auth-password-validators
@@ -143,3 +173,67 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
 }
+
+
+# Valuation
+
+HALL_RECALCULATE_BATCH_SIZE = int(os.environ.get('HALL_RECALCULATE_BATCH_SIZE', 500))
+
+# Background valuation (api/jobs.py). With ENABLED calculate and recalculate only queue a job and
+# answer 202; `manage.py valuation_worker` runs them. TIMEOUT (seconds) - a running job older than that
+# is taken over by another worker, at most MAX_ATTEMPTS times. POLL_INTERVAL - seconds between empty polls.
+VALUATION_JOBS = {
+    'ENABLED': os.environ.get('VALUATION_JOBS_ENABLED', '0') == '1',
+    'TIMEOUT': int(os.environ.get('VALUATION_JOBS_TIMEOUT', 600)),
+    'MAX_ATTEMPTS': int(os.environ.get('VALUATION_JOBS_MAX_ATTEMPTS', 3)),
+    'POLL_INTERVAL': float(os.environ.get('VALUATION_JOBS_POLL_INTERVAL', 1)),
+}
+
+# Most variants valued by one POST /api/halls/quote.
+HALL_QUOTE_MAX_VARIANTS = int(os.environ.get('HALL_QUOTE_MAX_VARIANTS', 1000))
+
+# Most halls valued by one GET /api/halls/values.
+HALL_VALUES_MAX_HALLS = int(os.environ.get('HALL_VALUES_MAX_HALLS', 1000))
+
+# Hall geometries whose structural takeoff (api/takeoff.py) is memoized per process.
+TAKEOFF_CACHE_SIZE = int(os.environ.get('TAKEOFF_CACHE_SIZE', 4096))
+
+# Rows fetched per round trip by the streaming export (GET /api/halls/export).
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# Rows upserted per INSERT ... ON CONFLICT by the price list import.
+PRICE_IMPORT_CHUNK_SIZE = int(os.environ.get('PRICE_IMPORT_CHUNK_SIZE', 1000))
+
+
+# JWT authentication
+# MODE: 'database' - user read on every request, 'cached' - users kept in a per-process LRU cache
+# for USER_CACHE_TTL seconds, 'stateless' - user built from token claims without touching the database.
+# Stateless tokens cannot be revoked: a password change, deactivation or demotion only takes effect
+# when the access token expires - keep ACCESS_TOKEN_LIFETIME short and let clients use refresh tokens,
+# whose refresh always reads the user.
+
+JWT_AUTH = {
+    'MODE': os.environ.get('JWT_AUTH_MODE', 'database'),
+    'USER_CACHE_SIZE': int(os.environ.get('JWT_USER_CACHE_SIZE', 1024)),
+    'USER_CACHE_TTL': int(os.environ.get('JWT_USER_CACHE_TTL', 60)),
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.environ.get('JWT_ACCESS_TOKEN_MINUTES', 15))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.environ.get('JWT_REFRESH_TOKEN_DAYS', 14))),
+}
+
+
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+# e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://redis:6379
+# or CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache CACHE_LOCATION=/var/tmp/hall_calc
+
+# List responses of halls and prices (see api/response_cache.py).
+API_RESPONSE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': int(os.environ.get('API_RESPONSE_CACHE_TIMEOUT', 300)),
+}